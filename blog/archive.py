@@ -0,0 +1,146 @@
+"""
+Cold-data archiving for comments and reactions of old posts.
+
+Approved comments and likes/dislikes of posts older than
+settings.BLOG_ARCHIVE_AFTER_DAYS are moved to ArchivedComment and
+ArchivedReaction in batches of posts. The moved amounts are kept on the post
+(`archived_*_count`), so counts stay a single-row read and hot queries only
+touch recent data. Reads merge the archive back in only for posts with
+`archived_at` set.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedComment, ArchivedReaction, Comment, Post
+
+REACTION_THROUGH = (
+    (ArchivedReaction.LIKE, Post.likes.through),
+    (ArchivedReaction.DISLIKE, Post.dislikes.through),
+)
+
+
+def _archived_count(queryset):
+    counts = queryset.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def archive_post_batch(post_ids):
+    """Move approved comments and reactions of `post_ids` to the archive tables."""
+    with transaction.atomic():
+        # Delete exactly the rows that were copied, not whatever matches by then
+        comments = list(Comment.objects.filter(post_id__in=post_ids, approved=True))
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(id=c.pk, post_id=c.post_id, name=c.name, email=c.email,
+                            content=c.content, created_at=c.created_at, approved=True)
+            for c in comments
+        ], ignore_conflicts=True)
+        moved_comments = Comment.objects.filter(pk__in=[c.pk for c in comments]).delete()[0]
+
+        moved_reactions = 0
+        for kind, through in REACTION_THROUGH:
+            rows = list(through.objects.filter(post_id__in=post_ids).values_list('pk', 'post_id', 'user_id'))
+            ArchivedReaction.objects.bulk_create([
+                ArchivedReaction(post_id=post_id, user_id=user_id, kind=kind)
+                for _, post_id, user_id in rows
+            ], ignore_conflicts=True)
+            moved_reactions += through.objects.filter(pk__in=[row[0] for row in rows]).delete()[0]
+
+        Post.objects.filter(pk__in=post_ids).update(
+            archived_at=timezone.now(),
+            archived_comment_count=_archived_count(ArchivedComment.objects.all()),
+            archived_like_count=_archived_count(ArchivedReaction.objects.filter(kind=ArchivedReaction.LIKE)),
+            archived_dislike_count=_archived_count(ArchivedReaction.objects.filter(kind=ArchivedReaction.DISLIKE)),
+        )
+    return moved_comments, moved_reactions
+
+
+def archive_cold_data(older_than_days=None, batch_size=100, include_archived=False):
+    """
+    Archive posts created before the cutoff. Yields per-batch stats.
+
+    Posts archived by an earlier run are skipped unless `include_archived`,
+    which also sweeps comments and reactions they received since.
+    """
+    if older_than_days is None:
+        older_than_days = settings.BLOG_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    candidates = Post.objects.filter(created_at__lt=cutoff).order_by('pk')
+    if not include_archived:
+        candidates = candidates.filter(archived_at__isnull=True)
+
+    last_pk = 0
+    while True:
+        post_ids = list(candidates.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not post_ids:
+            break
+        moved_comments, moved_reactions = archive_post_batch(post_ids)
+        last_pk = post_ids[-1]
+        yield len(post_ids), moved_comments, moved_reactions
+
+
+def approved_comments(post):
+    """Approved comments of `post`, hot and archived, oldest first."""
+    comments = list(post.comments.filter(approved=True))
+    if post.archived_at:
+        comments = sorted(
+            list(post.archived_comments.all()) + comments,
+            key=lambda comment: comment.created_at,
+        )
+    return comments
+
+
+def has_archived_reaction(post, user, kind):
+    if not post.archived_at:
+        return False
+    return post.archived_reactions.filter(user_id=user.pk, kind=kind).exists()
+
+
+def restore_reactions(post, user):
+    """
+    Move `user`'s archived reactions on `post` back to the hot tables.
+
+    Called before a like/dislike toggle so the toggle logic only ever has
+    to look at the through tables.
+    """
+    if not post.archived_at:
+        return
+    with transaction.atomic():
+        kinds = list(post.archived_reactions.filter(user_id=user.pk).values_list('kind', flat=True))
+        if not kinds:
+            return
+        likes = kinds.count(ArchivedReaction.LIKE)
+        dislikes = kinds.count(ArchivedReaction.DISLIKE)
+        if likes:
+            post.likes.add(user)
+        if dislikes:
+            post.dislikes.add(user)
+        post.archived_reactions.filter(user_id=user.pk).delete()
+        Post.objects.filter(pk=post.pk).update(
+            archived_like_count=F('archived_like_count') - likes,
+            archived_dislike_count=F('archived_dislike_count') - dislikes,
+        )
+        post.archived_like_count -= likes
+        post.archived_dislike_count -= dislikes
+
+
+def forget_user(user_id):
+    """
+    Take a deleted user's archived reactions out of the post counters.
+
+    Runs before the delete cascades to ArchivedReaction; a user has at most
+    one reaction of each kind per post, so every affected post drops by one.
+    """
+    post_ids = set()
+    for kind, field in ((ArchivedReaction.LIKE, 'archived_like_count'),
+                        (ArchivedReaction.DISLIKE, 'archived_dislike_count')):
+        ids = list(ArchivedReaction.objects.filter(user_id=user_id, kind=kind).values_list('post_id', flat=True))
+        for start in range(0, len(ids), 1000):
+            Post.objects.filter(pk__in=ids[start:start + 1000]).update(**{field: F(field) - 1})
+        post_ids.update(ids)
+    # Counts changed, so sync clients need these posts again
+    Post.bump_change_seq(post_ids)
@@ -0,0 +1,119 @@
+"""
+In-memory prefix index for the search box autocomplete.
+
+Every word of a published post title and of a category name becomes an
+entry in one sorted list, so a lookup is a bisect plus a short scan.
+Each process keeps its own index and rebuilds it when the version key in
+the cache changes; signals in blog/signals.py bump that key whenever a
+title, category or publication status changes.
+"""
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .cacheutils import incr
+from .models import Category, Post
+
+VERSION_KEY = 'blog:autocomplete:version'
+# Rebuild even without a version bump, e.g. after the cache dropped the key
+MAX_AGE = 300
+MAX_LIMIT = 20
+# Bounds the work for multi-word queries whose later words rarely match
+MAX_SCAN = 2000
+
+CATEGORY = 'category'
+POST = 'post'
+
+_word = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lowercase and strip accents, so 'programación' matches 'programacion'."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return _word.findall(normalize(text))
+
+
+class PrefixIndex:
+    def __init__(self, categories, posts):
+        # (word, group, -published timestamp, key): categories sort before
+        # posts and newer posts before older ones for the same word
+        entries = []
+        self.items = {}
+        for pk, name, slug in categories:
+            key = (CATEGORY, pk)
+            self.items[key] = {'type': CATEGORY, 'label': name, 'slug': slug, 'words': tokenize(name)}
+            entries += [(word, 0, 0, key) for word in set(self.items[key]['words'])]
+        for pk, title, slug, published_at in posts:
+            key = (POST, pk)
+            self.items[key] = {'type': POST, 'label': title, 'slug': slug, 'words': tokenize(title)}
+            recency = -published_at.timestamp() if published_at else 0
+            entries += [(word, 1, recency, key) for word in set(self.items[key]['words'])]
+        entries.sort()
+        self.words = [entry[0] for entry in entries]
+        self.keys = [entry[3] for entry in entries]
+
+    def search(self, query, limit):
+        words = tokenize(query)
+        if not words:
+            return []
+        # The last word is still being typed; the others must prefix-match too
+        *others, prefix = words
+        results, seen = [], set()
+        start = bisect_left(self.words, prefix)
+        for position in range(start, min(start + MAX_SCAN, len(self.words))):
+            if not self.words[position].startswith(prefix):
+                break
+            key = self.keys[position]
+            if key in seen:
+                continue
+            seen.add(key)
+            item = self.items[key]
+            if all(any(word.startswith(other) for word in item['words']) for other in others):
+                results.append({'type': item['type'], 'label': item['label'], 'slug': item['slug']})
+                if len(results) == limit:
+                    break
+        return results
+
+
+_index = None
+_index_version = None
+_index_built_at = 0
+_rebuild_lock = threading.Lock()
+
+
+def build_index():
+    categories = Category.objects.values_list('id', 'name', 'slug')
+    posts = Post.objects.filter(status='published').values_list('id', 'title', 'slug', 'published_at')
+    return PrefixIndex(categories.iterator(), posts.iterator(chunk_size=5000))
+
+
+def get_index():
+    global _index, _index_version, _index_built_at
+    version = cache.get(VERSION_KEY)
+    fresh = _index is not None and version == _index_version and time.monotonic() - _index_built_at < MAX_AGE
+    if fresh:
+        return _index
+    # One thread rebuilds; the others keep answering from the previous index
+    if not _rebuild_lock.acquire(blocking=_index is None):
+        return _index
+    try:
+        _index, _index_version, _index_built_at = build_index(), version, time.monotonic()
+    finally:
+        _rebuild_lock.release()
+    return _index
+
+
+def invalidate():
+    incr(cache, VERSION_KEY, None)
+
+
+def suggest(query, limit=10):
+    return get_index().search(query, min(limit, MAX_LIMIT))
@@ -0,0 +1,9 @@
+def incr(cache, key, timeout):
+    """Atomically increment `key`, creating it with `timeout` if needed."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key expired between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
@@ -0,0 +1,120 @@
+"""
+Post view counting without a database write per read.
+
+Each view is an atomic increment of a per-post pending counter in the
+cache. The first pending view of a post appends its id to a small log so
+the flusher knows which counters to drain. Flushing drains the counters
+and applies every delta to `Post.views` in a single UPDATE.
+
+With a shared cache (settings.BLOG_CACHE_URL) any process can flush,
+including the `flush_post_views` command, and the detail view shows every
+worker's pending views. With the LocMemCache fallback each worker keeps
+its own counters: it flushes them itself from record_view() and once more
+when it exits, and the command refuses to run since it would only see its
+own empty cache.
+"""
+import atexit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Case, F, PositiveBigIntegerField, Value, When
+
+from .cacheutils import incr
+from .models import Post
+
+PENDING_KEY = 'post-views:pending:%s'
+LOG_SEQ_KEY = 'post-views:log-seq'
+LOG_KEY = 'post-views:log:%s'
+FLUSHED_SEQ_KEY = 'post-views:flushed-seq'
+GAPS_KEY = 'post-views:gaps'
+FLUSH_DUE_KEY = 'post-views:flush-due'
+FLUSH_LOCK_KEY = 'post-views:flush-lock'
+
+KEY_TIMEOUT = 7 * 24 * 3600
+LOG_CHUNK = 1000
+
+
+def is_process_local():
+    """Whether the counters live in this process only (LocMemCache, possibly behind a wrapper)."""
+    return isinstance(getattr(cache, 'backend', cache), LocMemCache)
+
+
+def _flush_at_exit():
+    if settings.BLOG_VIEW_FLUSH_AT_EXIT and is_process_local():
+        flush_views()
+
+
+# Forked workers inherit this and flush their own counters when they exit
+atexit.register(_flush_at_exit)
+
+
+def _mark_dirty(post_id):
+    seq = incr(cache, LOG_SEQ_KEY, None)
+    cache.set(LOG_KEY % seq, post_id, KEY_TIMEOUT)
+
+
+def record_view(post):
+    if incr(cache, PENDING_KEY % post.pk, KEY_TIMEOUT) == 1:
+        _mark_dirty(post.pk)
+
+    # Whoever creates the "due" key first flushes; it expires after the interval
+    if cache.add(FLUSH_DUE_KEY, 1, settings.BLOG_VIEW_FLUSH_INTERVAL):
+        # Keep the loaded instance in step with what was just written
+        post.views += flush_views().get(post.pk, 0)
+
+
+def pending_views(post_id):
+    return cache.get(PENDING_KEY % post_id, 0)
+
+
+def _dirty_post_ids():
+    flushed = cache.get(FLUSHED_SEQ_KEY, 0)
+    last = cache.get(LOG_SEQ_KEY, 0)
+    # A writer may hold a seq whose entry is not stored yet; such gaps are re-read on later
+    # flushes until they are LOG_CHUNK seqs old (the writer died in between)
+    gaps = [seq for seq in cache.get(GAPS_KEY, []) if seq > last - LOG_CHUNK]
+    seqs = gaps + list(range(flushed + 1, last + 1))
+    post_ids, missing = set(), []
+
+    for start in range(0, len(seqs), LOG_CHUNK):
+        chunk = seqs[start:start + LOG_CHUNK]
+        found = cache.get_many([LOG_KEY % seq for seq in chunk])
+        missing += [seq for seq in chunk if LOG_KEY % seq not in found]
+        post_ids.update(found.values())
+        cache.delete_many(found)
+
+    cache.set_many({FLUSHED_SEQ_KEY: last, GAPS_KEY: missing}, None)
+    return post_ids
+
+
+def flush_views():
+    """Write pending view deltas to the database. Returns {post_id: delta}."""
+    if not cache.add(FLUSH_LOCK_KEY, 1, 60):
+        return {}
+
+    try:
+        deltas = {}
+        for post_id in _dirty_post_ids():
+            key = PENDING_KEY % post_id
+            pending = cache.get(key, 0)
+            if not pending:
+                continue
+            try:
+                remaining = cache.decr(key, pending)
+            except ValueError:
+                continue
+            deltas[post_id] = pending
+            # Views that arrived while we were draining need another flush
+            if remaining > 0:
+                _mark_dirty(post_id)
+
+        if deltas:
+            Post.objects.filter(pk__in=deltas).update(views=F('views') + Case(
+                *[When(pk=post_id, then=Value(delta)) for post_id, delta in deltas.items()],
+                default=Value(0),
+                output_field=PositiveBigIntegerField(),
+            ))
+        return deltas
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
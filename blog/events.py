@@ -0,0 +1,152 @@
+"""
+Live post updates over Server-Sent Events.
+
+Views publish count changes and newly approved comments to an in-process
+broker; the ASGI view in blog/views.py streams them to subscribers of that
+post. Each subscription coalesces what arrives between flushes: only the
+latest counts are kept, comments are batched, and a subscriber is woken at
+most once per COALESCE_INTERVAL, so a burst of likes turns into a few
+events per second per client.
+
+The broker lives in the process, so publishers and the SSE stream have to
+run in the same ASGI worker (e.g. `gunicorn core.asgi:application -k
+uvicorn.workers.UvicornWorker -w 1`, or uvicorn/daphne) for events to reach
+subscribers.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from .models import Comment, Post
+from .serializers import CommentSerializer
+
+COALESCE_INTERVAL = 0.25
+HEARTBEAT_INTERVAL = 15
+
+COUNTS = 'counts'
+COMMENTS = 'comments'
+
+
+class Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.ready = asyncio.Event()
+        self._lock = threading.Lock()
+        self._counts = None
+        self._comments = []
+        self._scheduled = False
+
+    def offer(self, kind, payload):
+        """Queue an event; safe to call from any thread."""
+        with self._lock:
+            if kind == COUNTS:
+                self._counts = payload
+            else:
+                self._comments.append(payload)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+    def drain(self):
+        with self._lock:
+            events = []
+            if self._counts is not None:
+                events.append((COUNTS, self._counts))
+            if self._comments:
+                events.append((COMMENTS, self._comments))
+            self._counts = None
+            self._comments = []
+            self._scheduled = False
+            self.ready.clear()
+        return events
+
+
+class Broker:
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, post_id):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[post_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, post_id, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(post_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[post_id]
+
+    def has_subscribers(self, post_id):
+        return post_id in self._subscriptions
+
+    def publish(self, post_id, kind, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(post_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.offer(kind, payload)
+            except RuntimeError:
+                # The subscriber's event loop is gone (server shutting down)
+                self.unsubscribe(post_id, subscription)
+
+
+broker = Broker()
+
+
+def counts(post, like_count=None, dislike_count=None):
+    return {
+        'like_count': post.total_likes() if like_count is None else like_count,
+        'dislike_count': post.total_dislikes() if dislike_count is None else dislike_count,
+        'comment_count': post.total_comments(),
+    }
+
+
+def publish_counts(post, like_count=None, dislike_count=None):
+    # Nobody listening in this process: skip the count queries entirely
+    if broker.has_subscribers(post.pk):
+        broker.publish(post.pk, COUNTS, counts(post, like_count, dislike_count))
+
+
+def publish_approved_comments(comment_ids):
+    """Push newly approved comments, and the new counts, to their posts' subscribers."""
+    comments = Comment.objects.filter(pk__in=comment_ids, approved=True).order_by('created_at', 'pk')
+    post_ids = set()
+    for comment in comments:
+        if broker.has_subscribers(comment.post_id):
+            broker.publish(comment.post_id, COMMENTS, CommentSerializer(comment).data)
+            post_ids.add(comment.post_id)
+    for post in Post.objects.filter(pk__in=post_ids):
+        publish_counts(post)
+
+
+def format_event(kind, payload):
+    return f'event: {kind}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+
+
+async def stream(post):
+    """Async iterator of SSE frames for one subscriber of `post`."""
+    # Subscribe before taking the snapshot so no update falls in between
+    subscription = broker.subscribe(post.pk)
+    try:
+        yield 'retry: 3000\n\n'
+        yield format_event(COUNTS, await sync_to_async(counts)(post))
+        while True:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            for kind, payload in subscription.drain():
+                yield format_event(kind, payload)
+            # Let further updates pile up before waking this subscriber again
+            await asyncio.sleep(COALESCE_INTERVAL)
+    finally:
+        broker.unsubscribe(post.pk, subscription)
@@ -0,0 +1,140 @@
+"""
+Read-only fast serialization for the list endpoints.
+
+Rows are pulled with `.values()` plus annotated counts and turned into plain
+dicts that render to exactly the same JSON as PostListSerializer and
+CategorySerializer, without building model instances or running DRF fields
+per row. Keep the key order in sync with the serializers' Meta.fields;
+FastPathEquivalenceTestCase enforces it.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from rest_framework import serializers
+
+from .models import ArchivedReaction, Comment, Post
+
+# A single unbound field gives us DRF's exact datetime formatting and timezone handling
+_datetime_field = serializers.DateTimeField()
+
+AUTHOR_FIELDS = ('author__username', 'author__password', 'author__email',
+                 'author__first_name', 'author__last_name')
+CATEGORY_FIELDS = ('category__name', 'category__slug', 'category__description',
+                   'category__created_at')
+POST_FIELDS = ('id', 'title', 'slug', 'status', 'created_at', 'updated_at', 'published_at',
+               'excerpt', 'word_count', 'reading_time', 'author_id', 'category_id',
+               'archived_at', 'archived_comment_count', 'archived_like_count', 'archived_dislike_count')
+
+
+def _datetime(value):
+    if value is None:
+        return None
+    return _datetime_field.to_representation(value)
+
+
+def _count(queryset):
+    counts = queryset.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def post_list_values(queryset, lite=False):
+    """Turn a Post queryset into a values() queryset carrying everything the list needs."""
+    fields = POST_FIELDS + AUTHOR_FIELDS + CATEGORY_FIELDS
+    if not lite:
+        fields += ('content',)
+    return queryset.annotate(
+        comment_count=_count(Comment.objects.filter(approved=True)),
+        like_count=_count(Post.likes.through.objects.all()),
+        dislike_count=_count(Post.dislikes.through.objects.all()),
+    ).values(*fields, 'comment_count', 'like_count', 'dislike_count')
+
+
+def _reacted_post_ids(through, user, post_ids):
+    return set(
+        through.objects.filter(user_id=user.pk, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+
+
+def _archived_reactions(user, post_ids):
+    liked, disliked = set(), set()
+    rows = ArchivedReaction.objects.filter(user_id=user.pk, post_id__in=post_ids).values_list('post_id', 'kind')
+    for post_id, kind in rows:
+        (liked if kind == ArchivedReaction.LIKE else disliked).add(post_id)
+    return liked, disliked
+
+
+def post_list_rows(values, request=None, lite=False):
+    """Build PostListSerializer-shaped dicts from `post_list_values()` rows."""
+    values = list(values)
+    liked = disliked = ()
+    user = getattr(request, 'user', None)
+    if values and user is not None and user.is_authenticated:
+        post_ids = [row['id'] for row in values]
+        liked = _reacted_post_ids(Post.likes.through, user, post_ids)
+        disliked = _reacted_post_ids(Post.dislikes.through, user, post_ids)
+        archived_ids = [row['id'] for row in values if row['archived_at']]
+        if archived_ids:
+            archived_liked, archived_disliked = _archived_reactions(user, archived_ids)
+            liked |= archived_liked
+            disliked |= archived_disliked
+
+    rows = []
+    for row in values:
+        if row['category_id'] is None:
+            category = None
+        else:
+            category = {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'slug': row['category__slug'],
+                'description': row['category__description'],
+                'created_at': _datetime(row['category__created_at']),
+            }
+        item = {
+            'id': row['id'],
+            'title': row['title'],
+            'slug': row['slug'],
+            'content': row.get('content'),
+            'author': {
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'password': row['author__password'],
+                'email': row['author__email'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+            },
+            'category': category,
+            'status': row['status'],
+            'created_at': _datetime(row['created_at']),
+            'updated_at': _datetime(row['updated_at']),
+            'published_at': _datetime(row['published_at']),
+            'comment_count': row['comment_count'] + row['archived_comment_count'],
+            'like_count': row['like_count'] + row['archived_like_count'],
+            'dislike_count': row['dislike_count'] + row['archived_dislike_count'],
+            'user_has_liked': row['id'] in liked,
+            'user_has_disliked': row['id'] in disliked,
+            'excerpt': row['excerpt'],
+            'word_count': row['word_count'],
+            'reading_time': row['reading_time'],
+        }
+        if lite:
+            del item['content']
+        rows.append(item)
+    return rows
+
+
+def category_values(queryset):
+    return queryset.values('id', 'name', 'slug', 'description', 'created_at')
+
+
+def category_rows(values):
+    """Build CategorySerializer-shaped dicts from `category_values()` rows."""
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'description': row['description'],
+            'created_at': _datetime(row['created_at']),
+        }
+        for row in values
+    ]
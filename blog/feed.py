@@ -0,0 +1,154 @@
+"""
+Personalized home feed.
+
+Publishing a post fans it out into FeedEntry rows for the followers of its
+author and of its category, so reading a feed page is a single range scan
+of the (user, published_at, post) index. Authors and categories with more
+than settings.BLOG_FEED_FANOUT_MAX_FOLLOWERS followers are the exception:
+writing a row per follower would dominate write volume, so their posts are
+merged in at read time instead.
+
+Fan-out does not run in the request: saving a post that needs it queues a
+FeedFanOut row in the same transaction, and `process_feed_fanout` drains
+the queue. Unpublishing and re-dating stay inline, as single statements.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (AuthorFollow, CategoryFollow, FeedEntry, FeedFanOut, PopularAuthor, PopularCategory,
+                     Post)
+from .pagination import encode_cursor, keyset_filter
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def _merged_on_read(marker, followers, **owner):
+    """Mark and report authors/categories with more than BLOG_FEED_FANOUT_MAX_FOLLOWERS followers."""
+    if marker.objects.filter(**owner).exists():
+        return True
+    limit = settings.BLOG_FEED_FANOUT_MAX_FOLLOWERS
+    if followers[:limit + 1].count() > limit:
+        # Once merged at read time they stay that way, so none of their posts go missing
+        marker.objects.get_or_create(**owner)
+        return True
+    return False
+
+
+def _insert_entries(post, user_ids):
+    published_at = post.published_at or timezone.now()
+    batch = []
+    for user_id in user_ids:
+        if user_id == post.author_id:
+            continue
+        batch.append(FeedEntry(user_id=user_id, post_id=post.pk, published_at=published_at))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Write `post` into the timelines of its author's and category's followers."""
+    followers = AuthorFollow.objects.filter(author_id=post.author_id).values_list('follower_id', flat=True)
+    if not _merged_on_read(PopularAuthor, followers, author_id=post.author_id):
+        _insert_entries(post, followers.iterator(chunk_size=FANOUT_BATCH_SIZE))
+    if post.category_id:
+        followers = CategoryFollow.objects.filter(category_id=post.category_id).values_list('follower_id', flat=True)
+        if not _merged_on_read(PopularCategory, followers, category_id=post.category_id):
+            _insert_entries(post, followers.iterator(chunk_size=FANOUT_BATCH_SIZE))
+
+
+def refresh(post_id):
+    """Rewrite a post's feed entries from scratch, e.g. after it moved to another category."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    with transaction.atomic():
+        retract(post)
+        if post.status == 'published':
+            fan_out(post)
+
+
+def process_pending(batch_size=100):
+    """Drain the FeedFanOut queue; safe to run in several processes at once. Returns the jobs done."""
+    done = 0
+    while True:
+        with transaction.atomic():
+            jobs = list(FeedFanOut.objects.select_for_update(skip_locked=True).order_by('pk')[:batch_size])
+            if not jobs:
+                return done
+            for post_id in dict.fromkeys(job.post_id for job in jobs):
+                refresh(post_id)
+            FeedFanOut.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        done += len(jobs)
+
+
+def retract(post):
+    FeedEntry.objects.filter(post_id=post.pk).delete()
+
+
+def redate(post_id, published_at):
+    """Move a re-dated post's entries so timelines stay in (published_at, post) order."""
+    FeedEntry.objects.filter(post_id=post_id).update(published_at=published_at)
+
+
+def backfill(user, posts):
+    """Seed a new follower's timeline with the most recent of `posts`."""
+    recent = posts.filter(status='published', published_at__isnull=False).order_by('-published_at')
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user=user, post_id=post_id, published_at=published_at)
+        for post_id, published_at in recent.values_list('id', 'published_at')[:settings.BLOG_FEED_BACKFILL]
+    ], ignore_conflicts=True)
+
+
+def unfollow_author(user, author):
+    AuthorFollow.objects.filter(follower=user, author=author).delete()
+    # Keep posts that are still in the timeline through a followed category
+    FeedEntry.objects.filter(user=user, post__author=author).exclude(
+        post__category__followers__follower=user,
+    ).delete()
+
+
+def unfollow_category(user, category):
+    CategoryFollow.objects.filter(follower=user, category=category).delete()
+    FeedEntry.objects.filter(user=user, post__category=category).exclude(
+        post__author__author_followers__follower=user,
+    ).delete()
+
+
+def read_feed(user, cursor=None, limit=20):
+    """
+    Return ([(published_at, post_id), ...], next_cursor) for one feed page.
+
+    Precomputed entries and posts of followed popular authors/categories
+    are each read with a keyset-limited query and merged in (published_at,
+    id) order.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if cursor:
+        entries = entries.filter(keyset_filter('published_at', 'post_id', cursor))
+    page = list(entries.order_by('-published_at', '-post_id').values_list('published_at', 'post_id')[:limit])
+
+    authors = AuthorFollow.objects.filter(
+        follower=user, author__popular_marker__isnull=False,
+    ).values_list('author_id', flat=True)
+    categories = CategoryFollow.objects.filter(
+        follower=user, category__popular_marker__isnull=False,
+    ).values_list('category_id', flat=True)
+    authors, categories = list(authors), list(categories)
+    if authors or categories:
+        merged = Post.objects.filter(
+            Q(author_id__in=authors) | Q(category_id__in=categories),
+            status='published', published_at__isnull=False,
+        ).exclude(author=user)
+        if cursor:
+            merged = merged.filter(keyset_filter('published_at', 'id', cursor))
+        page += merged.order_by('-published_at', '-id').values_list('published_at', 'id')[:limit]
+
+    # Fan-out from before the marker, or through the other follow, may already have put a post here
+    page = sorted(set(page), reverse=True)[:limit]
+    next_cursor = encode_cursor(*page[-1]) if len(page) == limit else None
+    return page, next_cursor
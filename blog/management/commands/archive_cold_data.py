@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.archive import archive_cold_data
+
+
+class Command(BaseCommand):
+    help = 'Move approved comments and reactions of old posts to the archive tables in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.BLOG_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=100, help='Posts per transaction')
+        parser.add_argument('--all', action='store_true',
+                            help='Also re-sweep posts archived before, for comments and reactions added since')
+
+    def handle(self, *args, **options):
+        posts = comments = reactions = 0
+        for batch_posts, batch_comments, batch_reactions in archive_cold_data(
+            options['older_than_days'], options['batch_size'], options['all']
+        ):
+            posts += batch_posts
+            comments += batch_comments
+            reactions += batch_reactions
+            self.stdout.write(f'Processed {posts} posts')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {comments} comments and {reactions} reactions from {posts} posts'
+        ))
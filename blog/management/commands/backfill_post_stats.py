@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute excerpt, word count and reading time for existing posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+
+        # Walk the table by primary key so every batch is a cheap index range scan
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'content')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for post in batch:
+                post.update_content_stats()
+            with transaction.atomic():
+                Post.objects.bulk_update(batch, ['excerpt', 'word_count', 'reading_time'])
+
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f'Processed {total} posts')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled stats for {total} posts'))
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from blog import fastpaths
+from blog.models import Category, Comment, Post
+from blog.serializers import PostListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the values() fast path against PostListSerializer on seeded posts (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def seed(self, rows, seed):
+        rng = random.Random(seed)
+        users = [User.objects.create_user(username=f'bench-user-{i}', password=None) for i in range(20)]
+        categories = [Category.objects.create(name=f'Bench category {i}') for i in range(5)]
+        posts = Post.objects.bulk_create([
+            Post(title=f'Bench post {i}', slug=f'bench-post-{i}', content='lorem ipsum ' * 200,
+                 author=rng.choice(users), category=rng.choice(categories + [None]), status='published')
+            for i in range(rows)
+        ])
+        for post in posts:
+            post.likes.add(*rng.sample(users, rng.randint(0, 10)))
+            post.dislikes.add(*rng.sample(users, rng.randint(0, 3)))
+        Comment.objects.bulk_create([
+            Comment(post=rng.choice(posts), name='bench', email='bench@example.com',
+                    content='comment', approved=rng.random() < 0.8)
+            for _ in range(rows * 3)
+        ])
+        return users[0]
+
+    def measure(self, func, iterations):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            body = func()
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1000, body
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self.seed(options['rows'], options['seed'])
+                request = SimpleNamespace(user=user)
+                queryset = Post.objects.filter(title__startswith='Bench post')
+                renderer = JSONRenderer()
+
+                def serializer_path():
+                    data = PostListSerializer(queryset, many=True, context={'request': request}).data
+                    return renderer.render(data)
+
+                def fast_path():
+                    values = fastpaths.post_list_values(queryset)
+                    return renderer.render(fastpaths.post_list_rows(values, request))
+
+                slow_ms, slow_body = self.measure(serializer_path, options['iterations'])
+                fast_ms, fast_body = self.measure(fast_path, options['iterations'])
+
+                self.stdout.write(f"rows={options['rows']} serializer median={slow_ms:.2f} ms")
+                self.stdout.write(f"rows={options['rows']} fast path  median={fast_ms:.2f} ms "
+                                  f"({slow_ms / fast_ms:.1f}x)")
+                if slow_body == fast_body:
+                    self.stdout.write(self.style.SUCCESS('Outputs are byte-for-byte identical'))
+                else:
+                    self.stderr.write(self.style.ERROR('Outputs differ'))
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from blog.models import Post
+from blog.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from blog.serializers import PostListSerializer
+
+
+def serialized_post_list(rows):
+    """PostListSerializer output for up to `rows` published posts created by seed_blog."""
+    posts = Post.objects.filter(slug__startswith='loadtest-post-', status='published').order_by('pk')
+    return PostListSerializer(posts.select_related('author', 'category')[:rows], many=True).data
+
+
+def synthetic_post_list(rows, seed):
+    """Build a payload shaped like PostListSerializer output."""
+    rng = random.Random(seed)
+    words = ['django', 'rest', 'blog', 'python', 'café', 'queries', 'cache', 'index', 'render']
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    data = ReturnList(serializer=None)
+
+    for i in range(1, rows + 1):
+        created = base + timedelta(minutes=rng.randint(0, 500000))
+        content = ' '.join(rng.choice(words) for _ in range(rng.randint(200, 1200)))
+        data.append(ReturnDict([
+            ('id', i),
+            ('title', f'Post {i} about {rng.choice(words)}'),
+            ('slug', f'post-{i}'),
+            ('content', content),
+            ('author', ReturnDict([
+                ('id', rng.randint(1, 50)),
+                ('username', f'user{rng.randint(1, 50)}'),
+                ('password', 'pbkdf2_sha256$1000000$salt$hash'),
+                ('email', 'user@example.com'),
+                ('first_name', 'Demo'),
+                ('last_name', 'User'),
+            ], serializer=None)),
+            ('category', ReturnDict([
+                ('id', 1),
+                ('name', 'General'),
+                ('slug', 'general'),
+                ('description', ''),
+                ('created_at', base.isoformat().replace('+00:00', 'Z')),
+            ], serializer=None)),
+            ('status', 'published'),
+            ('created_at', created.isoformat().replace('+00:00', 'Z')),
+            ('updated_at', created.isoformat().replace('+00:00', 'Z')),
+            ('published_at', created.isoformat().replace('+00:00', 'Z')),
+            ('comment_count', rng.randint(0, 40)),
+            ('like_count', rng.randint(0, 1000)),
+            ('dislike_count', rng.randint(0, 100)),
+            ('user_has_liked', False),
+            ('user_has_disliked', False),
+            ('excerpt', content[:240]),
+            ('word_count', len(content.split())),
+            ('reading_time', 3),
+        ], serializer=None))
+    return data
+
+
+class Command(BaseCommand):
+    help = ('Benchmark FastJSONRenderer (and MessagePack) against DRF JSONRenderer on PostListSerializer '
+            'output for the posts created by seed_blog')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Use generated dicts instead of the posts created by seed_blog')
+
+    def time_renderer(self, renderer, data, iterations):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            body = renderer.render(data)
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples) * 1000, len(body), body
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no'}, msgpack: {'yes' if msgpack else 'no'}")
+
+        renderers = [('drf-json', JSONRenderer()), ('fast-json', FastJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        for rows in options['rows']:
+            if options['synthetic']:
+                data = synthetic_post_list(rows, options['seed'])
+            else:
+                data = serialized_post_list(rows)
+                if not data:
+                    raise CommandError('No seeded posts; run "manage.py seed_blog" first or pass --synthetic')
+                if len(data) < rows:
+                    self.stderr.write(f'rows={rows}: only {len(data)} seeded posts are published')
+            results = {name: self.time_renderer(r, data, options['iterations']) for name, r in renderers}
+            baseline = results['drf-json'][0]
+
+            if results['fast-json'][2] != results['drf-json'][2]:
+                self.stderr.write(self.style.ERROR(f'rows={rows}: fast-json output differs from drf-json'))
+
+            for name, (median_ms, size, _) in results.items():
+                self.stdout.write(
+                    f'rows={rows:<5} {name:<10} median={median_ms:8.3f} ms  '
+                    f'size={size:>9} B  speedup={baseline / median_ms:5.2f}x'
+                )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.related import build
+
+
+class Command(BaseCommand):
+    help = 'Precompute related posts from co-likes and category overlap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only redo posts liked or edited since the last run and posts sharing their likers '
+                                 '(run a full build periodically for category changes)')
+        parser.add_argument('--top', type=int, default=None,
+                            help='Related posts kept per post (default: BLOG_RELATED_POSTS)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        processed = build(incremental=options['incremental'], top_k=options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Related posts built for {processed} posts in {time.perf_counter() - start:.1f}s'
+        ))
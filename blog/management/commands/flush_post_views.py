@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.counters import flush_views, is_process_local
+
+
+class Command(BaseCommand):
+    help = 'Write pending post view counts from the cache to the database (needs a shared cache)'
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            raise CommandError('The cache is local to each process, so pending views are only visible to the '
+                               'worker that counted them. Set BLOG_CACHE_URL to a shared cache.')
+        updated = len(flush_views())
+        self.stdout.write(self.style.SUCCESS(f'Flushed view counts for {updated} posts'))
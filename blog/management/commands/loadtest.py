@@ -0,0 +1,242 @@
+import http.client
+import json
+import platform
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Reads only: every request comes from one IP, so login/like/comment traffic would mostly measure the throttles
+DEFAULT_MIX = 'list=40,detail=35,search=15,lite_list=10'
+# Fail the run when more than this share of responses were throttled
+MAX_THROTTLED_SHARE = 0.5
+
+
+def parse_mix(value):
+    """{scenario: weight} from 'name=weight,...'; raises CommandError for anything else."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            mix[name] = -1
+        if mix[name] < 0:
+            raise CommandError(f'Invalid weight for {name}: {weight!r}')
+    if not any(mix.values()):
+        raise CommandError('At least one scenario needs a positive weight')
+    return mix
+
+
+def connect(url):
+    if url.scheme == 'https':
+        return http.client.HTTPSConnection(url.hostname, url.port or 443, timeout=30)
+    return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Scenarios:
+    """Builds the (name, method, path, body, headers) request for each traffic type."""
+
+    def __init__(self, fixture, rng):
+        self.fixture = fixture
+        self.rng = rng
+        self.usernames = list(fixture['tokens'])
+
+    def list(self):
+        return 'GET', '/api/posts/?status=published', None, {}
+
+    def lite_list(self):
+        return 'GET', '/api/posts/?status=published&lite=true', None, {}
+
+    def detail(self):
+        return 'GET', f"/api/posts/{self.rng.choice(self.fixture['post_slugs'])}/", None, {}
+
+    def search(self):
+        query = urlencode({'search': self.rng.choice(self.fixture['search_terms'])})
+        return 'GET', f'/api/posts/?{query}', None, {}
+
+    def like(self):
+        # Everyone piles onto the same post, the worst case for hot rows
+        username = self.rng.choice(self.usernames)
+        headers = {'Authorization': f"Token {self.fixture['tokens'][username]}"}
+        return 'POST', f"/api/posts/{self.fixture['hot_post_slug']}/toggle_like/", b'', headers
+
+    def comment(self):
+        body = json.dumps({
+            'name': 'Load tester',
+            'email': 'loadtest@example.com',
+            'content': 'Load test comment',
+        }).encode()
+        slug = self.rng.choice(self.fixture['post_slugs'])
+        return 'POST', f'/api/posts/{slug}/add_comment/', body, {'Content-Type': 'application/json'}
+
+    def login(self):
+        body = json.dumps({
+            'username': self.rng.choice(self.usernames),
+            'password': self.fixture['password'],
+        }).encode()
+        return 'POST', '/api/login/', body, {'Content-Type': 'application/json'}
+
+
+# The traffic types --mix may name
+SCENARIOS = {
+    'list': Scenarios.list,
+    'lite_list': Scenarios.lite_list,
+    'detail': Scenarios.detail,
+    'search': Scenarios.search,
+    'like': Scenarios.like,
+    'comment': Scenarios.comment,
+    'login': Scenarios.login,
+}
+
+
+class Command(BaseCommand):
+    help = ('Replay a configurable traffic mix against a running server and report '
+            'throughput and latency percentiles per endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--fixture', default='loadtest_fixture.json',
+                            help='File written by the seed_blog command')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Comma separated scenario=weight pairs')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run after warm-up')
+        parser.add_argument('--warmup', type=float, default=3)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Write JSON results here')
+        parser.add_argument('--baseline', help='Previous JSON results to compare against')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['fixture']) as fh:
+                fixture = json.load(fh)
+        except OSError as exc:
+            raise CommandError(f'Cannot read fixture ({exc}); run "manage.py seed_blog" first')
+
+        mix = parse_mix(options['mix'])
+        url = urlsplit(options['base_url'])
+        if url.scheme not in ('http', 'https'):
+            raise CommandError(f"Unsupported base URL {options['base_url']!r}")
+        samples = defaultdict(list)
+        statuses = defaultdict(Counter)
+        lock = threading.Lock()
+        start = time.monotonic()
+        measure_from = start + options['warmup']
+        stop_at = measure_from + options['duration']
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            scenarios = Scenarios(fixture, rng)
+            names, weights = list(mix), list(mix.values())
+            conn = connect(url)
+            while time.monotonic() < stop_at:
+                name = rng.choices(names, weights)[0]
+                method, path, body, headers = SCENARIOS[name](scenarios)
+                began = time.monotonic()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = response.status
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = connect(url)
+                    status = 'error'
+                elapsed_ms = (time.monotonic() - began) * 1000
+                if began >= measure_from:
+                    with lock:
+                        samples[name].append(elapsed_ms)
+                        statuses[name][status] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = self.summarize(samples, statuses, options['duration'])
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'base_url': options['base_url'],
+            'mix': mix,
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'python': platform.python_version(),
+            'endpoints': results,
+        }
+
+        self.print_report(results)
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                self.print_comparison(results, json.load(fh)['endpoints'])
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        throttled = sum(counts[429] for counts in statuses.values())
+        total = sum(sum(counts.values()) for counts in statuses.values())
+        if total and throttled / total > MAX_THROTTLED_SHARE:
+            raise CommandError(f'{throttled} of {total} responses were 429s, so this measured the throttles. '
+                               'Drop write scenarios from --mix or raise the THROTTLE_* rates on the server.')
+
+    def summarize(self, samples, statuses, duration):
+        results = {}
+        all_samples = []
+        for name, values in sorted(samples.items()):
+            values.sort()
+            all_samples.extend(values)
+            results[name] = self.stats(values, duration)
+            results[name]['statuses'] = {str(k): v for k, v in statuses[name].items()}
+        all_samples.sort()
+        results['total'] = self.stats(all_samples, duration)
+        return results
+
+    def stats(self, values, duration):
+        return {
+            'requests': len(values),
+            'throughput': round(len(values) / duration, 2),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+            'max_ms': values[-1] if values else None,
+        }
+
+    def print_report(self, results):
+        self.stdout.write(f"{'endpoint':<12}{'reqs':>8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}  statuses")
+        for name, row in results.items():
+            if not row['requests']:
+                continue
+            self.stdout.write(
+                f"{name:<12}{row['requests']:>8}{row['throughput']:>10.1f}"
+                f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}  "
+                f"{row.get('statuses', '')}"
+            )
+
+    def print_comparison(self, results, baseline):
+        self.stdout.write('\nChange vs baseline (negative latency / positive throughput is better):')
+        for name, row in results.items():
+            old = baseline.get(name)
+            if not old or not old['requests'] or not row['requests']:
+                continue
+            self.stdout.write(
+                f"{name:<12} req/s {100 * (row['throughput'] / old['throughput'] - 1):+6.1f}%  "
+                f"p95 {100 * (row['p95_ms'] / old['p95_ms'] - 1):+6.1f}%  "
+                f"p99 {100 * (row['p99_ms'] / old['p99_ms'] - 1):+6.1f}%"
+            )
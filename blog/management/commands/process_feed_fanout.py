@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.feed import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Write queued posts into their followers\' home feeds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, checking the queue every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            done = process_pending()
+            if done or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(f'Fanned out {done} queued posts'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
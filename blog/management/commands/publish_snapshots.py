@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.snapshots import publish
+
+
+class Command(BaseCommand):
+    help = 'Re-render the static JSON snapshots of the front page endpoints (also refreshes their counts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, republishing every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            manifest = publish()
+            for name, url in manifest['files'].items():
+                self.stdout.write(f'{name}: {url}')
+            self.stdout.write(self.style.SUCCESS('Snapshots published'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
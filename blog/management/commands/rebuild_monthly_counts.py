@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.monthly import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-month published post counts behind /api/archive/ from the posts table'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} monthly count rows'))
@@ -0,0 +1,97 @@
+import json
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from blog.models import Category, Comment, Post
+
+WORDS = ('django python rest api blog cache index query render database postgres '
+         'performance latency throughput worker request response serializer model').split()
+
+
+class Command(BaseCommand):
+    help = 'Seed a deterministic dataset for load testing and write a fixture file for the loadtest command'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=8)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--fixture', default='loadtest_fixture.json')
+
+    def sentence(self, rng, low, high):
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        password = make_password(options['password'])
+
+        users = []
+        for i in range(options['users']):
+            user, _ = User.objects.get_or_create(username=f'loadtest-{i}', defaults={
+                'email': f'loadtest-{i}@example.com', 'password': password,
+            })
+            users.append(user)
+        tokens = {user.username: Token.objects.get_or_create(user=user)[0].key for user in users}
+
+        categories = [
+            Category.objects.get_or_create(name=f'Load test {i}', defaults={'description': self.sentence(rng, 5, 15)})[0]
+            for i in range(options['categories'])
+        ]
+
+        existing = {post.slug: post for post in Post.objects.filter(slug__startswith='loadtest-post-')}
+        posts = []
+        now = timezone.now()
+        for i in range(options['posts']):
+            # Rows are drawn even when they exist, so every run consumes the RNG the same way
+            status = 'published' if rng.random() < 0.9 else 'draft'
+            fields = {
+                'title': f'Load test post {i} {self.sentence(rng, 2, 6)}',
+                'content': self.sentence(rng, 150, 1500),
+                'author': rng.choice(users),
+                'category': rng.choice(categories + [None]),
+                'status': status,
+            }
+            post = existing.get(f'loadtest-post-{i}')
+            if post is None:
+                # Post.save computes the excerpt/word count, so no bulk_create here
+                post = Post.objects.create(slug=f'loadtest-post-{i}',
+                                           published_at=now if status == 'published' else None, **fields)
+            posts.append(post)
+
+        for post in posts:
+            # set(), not add(): a re-run leaves the same likes instead of piling more on
+            post.likes.set(rng.sample(users, rng.randint(0, min(20, len(users)))))
+
+        comments = [
+            Comment(post=rng.choice(posts), name=f'Reader {i}', email=f'reader{i}@example.com',
+                    content=self.sentence(rng, 5, 60), approved=rng.random() < 0.8)
+            for i in range(options['comments'])
+        ]
+        seeded = Comment.objects.filter(post__in=posts, name__startswith='Reader ').count()
+        Comment.objects.bulk_create(comments[seeded:])
+
+        published = [post.slug for post in posts if post.status == 'published']
+        fixture = {
+            'seed': options['seed'],
+            'password': options['password'],
+            'tokens': tokens,
+            'post_slugs': published,
+            'hot_post_slug': published[0] if published else None,
+            'search_terms': WORDS,
+        }
+        with open(options['fixture'], 'w') as fh:
+            json.dump(fixture, fh, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(categories)} categories, {len(posts)} posts; "
+            f"fixture written to {options['fixture']}"
+        ))
@@ -0,0 +1,406 @@
+"""
+Request, database and cache metrics in Prometheus text format.
+
+MetricsMiddleware records per-view counters, latency histograms, response
+sizes and DB query counts/time into a per-process registry; the
+InstrumentedCache wrapper counts hits and misses of whichever cache backend
+it fronts. Every
+settings.BLOG_METRICS_FLUSH_INTERVAL seconds each process writes its
+totals to `<BLOG_METRICS_DIR>/<pid>-<start time>.json`, and /api/metrics/
+sums every worker's file, so all gunicorn workers show up in one scrape.
+Files of workers that have exited (or whose pid now belongs to a newer
+worker) are folded into retired.json and removed, so counters never go
+backwards and the process gauge only counts live workers.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db.backends.signals import connection_created
+from django.utils.functional import cached_property
+
+# Upper bounds of the latency histogram, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SEP = '\t'
+COUNTERS = ('requests', 'response_bytes', 'db_queries', 'db_seconds', 'cache')
+RETIRED = 'retired.json'
+RETIRE_LOCK = 'retired.lock'
+
+_worker_file = re.compile(r'^(\d+)-(\d+)\.json$')
+
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh)
+    # Readers only ever see complete files
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+class Registry:
+    def __init__(self):
+        self.init_process()
+        # A worker forked from a process that imported this module starts from zero
+        os.register_at_fork(after_in_child=self.init_process)
+
+    def init_process(self):
+        self.lock = threading.Lock()
+        self.filename = f'{os.getpid()}-{time.time_ns()}.json'
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)            # view, method, status
+        self.latency = {}                           # view, method -> bucket counts + [sum, count]
+        self.response_bytes = defaultdict(int)      # view
+        self.db_queries = defaultdict(int)          # view
+        self.db_seconds = defaultdict(float)        # view
+        self.cache = defaultdict(int)               # cache location, hit/miss
+        self.last_flush = 0
+
+    def record_request(self, view, method, status, seconds, size, queries, db_seconds):
+        with self.lock:
+            self.requests[SEP.join((view, method, str(status)))] += 1
+            key = SEP.join((view, method))
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = [0] * (len(BUCKETS) + 1) + [0.0, 0]
+            # Buckets are stored non-cumulative and summed on export
+            histogram[bisect_left(BUCKETS, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            if size is not None:
+                self.response_bytes[view] += size
+            self.db_queries[view] += queries
+            self.db_seconds[view] += db_seconds
+
+    def record_cache(self, location, hits, misses):
+        with self.lock:
+            if hits:
+                self.cache[SEP.join((location, 'hit'))] += hits
+            if misses:
+                self.cache[SEP.join((location, 'miss'))] += misses
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'latency': {key: list(value) for key, value in self.latency.items()},
+                'response_bytes': dict(self.response_bytes),
+                'db_queries': dict(self.db_queries),
+                'db_seconds': dict(self.db_seconds),
+                'cache': dict(self.cache),
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.BLOG_METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        directory = settings.BLOG_METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, self.filename), self.snapshot())
+
+
+registry = Registry()
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+# The timer of the request being handled; sync_to_async copies it into the thread running the ORM
+_query_timer = ContextVar('blog_metrics_query_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+connection_created.connect(instrument_connection, dispatch_uid='blog.metrics.instrument_connection')
+
+
+class MetricsMiddleware:
+    """
+    Per-view request metrics. Async-capable, so under ASGI requests (and the
+    SSE stream) stay on the event loop; queries are timed wherever the ORM
+    runs them through the context-local timer.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        token = _query_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _query_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, timer):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record_request(view, request.method, response.status_code, elapsed,
+                                size, timer.count, timer.seconds)
+        registry.flush()
+
+
+class InstrumentedCache(BaseCache):
+    """
+    Counts lookup hits and misses (get, get_many, get_or_set) of the cache
+    alias named in LOCATION and passes every call through to it, so it works
+    in front of any backend.
+    """
+
+    _missing = object()
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self.alias = name
+
+    @cached_property
+    def backend(self):
+        return caches[self.alias]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.add(key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        value = self.backend.get(key, self._missing, version)
+        hit = value is not self._missing
+        registry.record_cache(self.alias, int(hit), int(not hit))
+        return value if hit else default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.backend.set(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self.backend.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.backend.get_many(keys, version)
+        registry.record_cache(self.alias, len(found), len(keys) - len(found))
+        return found
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.backend.get(key, self._missing, version)
+        hit = value is not self._missing
+        registry.record_cache(self.alias, int(hit), int(not hit))
+        if hit:
+            return value
+        if callable(default):
+            default = default()
+        self.backend.add(key, default, timeout, version)
+        # Whoever added first wins, as in BaseCache.get_or_set()
+        return self.backend.get(key, default, version)
+
+    def has_key(self, key, version=None):
+        return self.backend.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.backend.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.backend.decr(key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.set_many(data, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        return self.backend.delete_many(keys, version)
+
+    def clear(self):
+        return self.backend.clear()
+
+    def close(self, **kwargs):
+        # The wrapped alias is closed by Django itself
+        pass
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def retire_exited_workers(directory):
+    """Fold the files of workers that are gone into RETIRED and delete them."""
+    workers = {}
+    for filename in os.listdir(directory):
+        match = _worker_file.match(filename)
+        if match:
+            workers[filename] = (int(match[1]), int(match[2]))
+    newest = {}
+    for pid, started in workers.values():
+        newest[pid] = max(newest.get(pid, 0), started)
+    # An older file of a reused pid belongs to a worker that has exited too
+    exited = [filename for filename, (pid, started) in workers.items()
+              if started < newest[pid] or not _alive(pid)]
+    if exited:
+        with open(os.path.join(directory, RETIRE_LOCK), 'w') as lock:
+            # Concurrent scrapes must not fold the same file twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired_path = os.path.join(directory, RETIRED)
+            retired = _read_json(retired_path) or {}
+            paths = [os.path.join(directory, filename) for filename in exited]
+            snapshots = [snapshot for snapshot in map(_read_json, paths) if snapshot is not None]
+            if snapshots:
+                _write_json(retired_path, _sum([retired] + snapshots))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+    return [filename for filename in workers if filename not in exited]
+
+
+def _sum(snapshots):
+    totals = {name: defaultdict(int) for name in COUNTERS}
+    latency = {}
+    for snapshot in snapshots:
+        for name, values in totals.items():
+            for key, value in snapshot.get(name, {}).items():
+                values[key] += value
+        for key, histogram in snapshot.get('latency', {}).items():
+            merged = latency.setdefault(key, [0] * len(histogram))
+            for i, value in enumerate(histogram):
+                merged[i] += value
+    totals['latency'] = latency
+    return totals
+
+
+def aggregate():
+    """Sum the snapshots of every worker process, live or retired."""
+    registry.flush(force=True)
+    directory = settings.BLOG_METRICS_DIR
+    live = retire_exited_workers(directory)
+    snapshots = [snapshot for snapshot in (_read_json(os.path.join(directory, filename)) for filename in live)
+                 if snapshot is not None]
+    # Read after retiring, so a worker folded meanwhile is in here instead
+    retired = _read_json(os.path.join(directory, RETIRED)) or {}
+    totals = _sum(snapshots + [retired])
+    totals['processes'] = len(snapshots)
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_prometheus(totals):
+    lines = [
+        '# HELP blog_http_requests_total Requests by view, method and status.',
+        '# TYPE blog_http_requests_total counter',
+    ]
+    for key, value in sorted(totals['requests'].items()):
+        view, method, status = key.split(SEP)
+        lines.append(f'blog_http_requests_total{_labels(view=view, method=method, status=status)} {value}')
+
+    lines += [
+        '# HELP blog_http_request_duration_seconds Request latency by view and method.',
+        '# TYPE blog_http_request_duration_seconds histogram',
+    ]
+    for key, histogram in sorted(totals['latency'].items()):
+        view, method = key.split(SEP)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram):
+            cumulative += count
+            lines.append(f'blog_http_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {cumulative}')
+        lines.append(f'blog_http_request_duration_seconds_sum{_labels(view=view, method=method)} {histogram[-2]}')
+        lines.append(f'blog_http_request_duration_seconds_count{_labels(view=view, method=method)} {histogram[-1]}')
+
+    for name, metric, kind, help_text in (
+        ('response_bytes', 'blog_http_response_bytes_total', 'counter', 'Response body bytes by view.'),
+        ('db_queries', 'blog_db_queries_total', 'counter', 'Database queries by view.'),
+        ('db_seconds', 'blog_db_query_seconds_total', 'counter', 'Time spent in database queries by view.'),
+    ):
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        for view, value in sorted(totals[name].items()):
+            lines.append(f'{metric}{_labels(view=view)} {value}')
+
+    lines += [
+        '# HELP blog_cache_requests_total Cache lookups by cache and result.',
+        '# TYPE blog_cache_requests_total counter',
+    ]
+    for key, value in sorted(totals['cache'].items()):
+        alias, result = key.split(SEP)
+        lines.append(f'blog_cache_requests_total{_labels(cache=alias, result=result)} {value}')
+
+    lines += [
+        '# HELP blog_metrics_processes Live worker snapshots included in this scrape.',
+        '# TYPE blog_metrics_processes gauge',
+        f'blog_metrics_processes {totals["processes"]}',
+    ]
+    return '\n'.join(lines) + '\n'
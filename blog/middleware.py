@@ -0,0 +1,230 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+import traceback
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from . import snapshots
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '__profile'
+TOP_FUNCTIONS = 30
+STACK_DEPTH = 4
+
+
+class SQLRecorder:
+    """connection.execute_wrapper() hook keeping each query, its time and the app code that ran it."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+                'origin': self.origin(),
+            })
+
+    @staticmethod
+    def origin():
+        base = str(settings.BASE_DIR)
+        frames = [
+            f'{os.path.relpath(frame.filename, base)}:{frame.lineno} {frame.name}'
+            for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(base) and 'site-packages' not in frame.filename
+        ]
+        return frames[-STACK_DEPTH:]
+
+
+class StaffProfilingMiddleware:
+    """
+    Profile a single request on demand for staff users.
+
+    Send `X-Profile: 1` or `?__profile=1` (session or token auth). The
+    request runs under cProfile with every SQL query recorded; the call
+    graph (`<id>.prof`, for pstats/snakeviz) and a JSON report go to
+    settings.BLOG_PROFILE_DIR (the newest settings.BLOG_PROFILE_KEEP are
+    kept), and the response carries X-Profile-Id and X-Profile-Summary.
+    Requests without the opt-in only pay for the check, and under ASGI
+    they stay on the event loop; profiled ones run in a worker thread that
+    sync views are dispatched back to, so the view and its SQL are captured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def requested(request):
+        return PROFILE_HEADER in request.META or PROFILE_PARAM in request.GET
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.requested(request) and self.is_staff(request):
+            return self.profile(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.requested(request) and await sync_to_async(self.is_staff)(request):
+            return await sync_to_async(self.profile)(request, async_to_sync(self.get_response))
+        return await self.get_response(request)
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            # PostViewSet and friends authenticate by token inside the view
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return result is not None and result[0].is_staff
+
+    def profile(self, request, get_response):
+        recorder = SQLRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        profile_id = f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        report = self.write(profile_id, profiler, recorder, request, response, elapsed_ms)
+        sql_ms = sum(query['ms'] for query in recorder.queries)
+        response['X-Profile-Id'] = profile_id
+        # The slowest frame of our own code says more than Django's handler chain
+        top = next((f['function'] for f in report['functions'] if f['app']), '-')
+        response['X-Profile-Summary'] = (
+            f'total={elapsed_ms:.1f}ms; sql={len(recorder.queries)} queries/{sql_ms:.1f}ms; top={top}'
+        )
+        return response
+
+    @staticmethod
+    def write(profile_id, profiler, recorder, request, response, elapsed_ms):
+        directory = settings.BLOG_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+
+        base = str(settings.BASE_DIR)
+        stats = pstats.Stats(profiler)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        report = {
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(elapsed_ms, 3),
+            'functions': [
+                {
+                    'function': f'{os.path.basename(filename)}:{line}({name})',
+                    'app': filename.startswith(base) and 'site-packages' not in filename,
+                    'calls': calls,
+                    'own_ms': round(own * 1000, 3),
+                    'cumulative_ms': round(cumulative * 1000, 3),
+                }
+                for (filename, line, name), (_, calls, own, cumulative, _) in functions[:TOP_FUNCTIONS]
+            ],
+            'sql': recorder.queries,
+        }
+        with open(os.path.join(directory, f'{profile_id}.json'), 'w') as fh:
+            json.dump(report, fh, indent=2)
+        StaffProfilingMiddleware.prune(directory, settings.BLOG_PROFILE_KEEP)
+        return report
+
+    @staticmethod
+    def prune(directory, keep):
+        reports = []
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                try:
+                    reports.append((os.stat(os.path.join(directory, name)).st_mtime_ns, name[:-len('.json')]))
+                except FileNotFoundError:
+                    pass  # pruned by a concurrent request
+        reports.sort()
+        for _, profile_id in reports[:max(len(reports) - keep, 0)]:
+            for suffix in ('.json', '.prof'):
+                try:
+                    os.remove(os.path.join(directory, profile_id + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class SnapshotWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also serves the JSON snapshots of blog/snapshots.py.
+
+    Those are written while the server runs, so unlike collected static
+    files they are looked up on disk. Hashed files are remembered per URL
+    (at most MAX_SNAPSHOT_FILES) and forgotten once prune() removes them.
+    """
+
+    MAX_SNAPSHOT_FILES = 256
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.snapshot_files = {}
+
+    def __call__(self, request):
+        path = request.path_info
+        if path.startswith(settings.BLOG_SNAPSHOT_URL):
+            static_file = self.find_snapshot(path)
+            if static_file is not None:
+                return self.serve(static_file, request)
+        return super().__call__(request)
+
+    def find_snapshot(self, url):
+        cached = self.snapshot_files.get(url)
+        if cached is not None:
+            path, static_file = cached
+            if os.path.exists(path):
+                return static_file
+            # Pruned since it was cached
+            self.snapshot_files.pop(url, None)
+        name = url[len(settings.BLOG_SNAPSHOT_URL):]
+        if not name or '/' in name or name.startswith('.'):
+            return None
+        path = os.path.join(settings.BLOG_SNAPSHOT_DIR, name)
+        try:
+            static_file = self.get_static_file(path, url)
+        except MissingFileError:
+            return None
+        # Hashed files never change; the manifest is re-read on every request
+        if snapshots.is_hashed(name):
+            if len(self.snapshot_files) >= self.MAX_SNAPSHOT_FILES:
+                self.snapshot_files.clear()
+            self.snapshot_files[url] = (path, static_file)
+        return static_file
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(settings.BLOG_SNAPSHOT_URL):
+            return snapshots.is_hashed(url[len(settings.BLOG_SNAPSHOT_URL):])
+        return super().immutable_file_test(path, url)
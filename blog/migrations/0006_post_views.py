@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_content_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-19 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_delta_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPostCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-year', '-month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-published_at'], name='blog_post_status_pub_idx'),
+        ),
+        migrations.AddField(
+            model_name='monthlypostcount',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='monthly_counts', to='blog.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlypostcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('year', 'month', 'category'), name='blog_monthlypostcount_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlypostcount',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('year', 'month'), name='blog_monthlypostcount_uncategorized_unique'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def number_existing_posts(apps, schema_editor):
+    """Give posts created before delta sync their own change_seq so a full sync returns them."""
+    Post = apps.get_model('blog', 'Post')
+    ChangeSequence = apps.get_model('blog', 'ChangeSequence')
+    pending = list(Post.objects.filter(change_seq=0).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start:start + BATCH_SIZE]
+        # Allocating through ChangeSequence also moves it past the numbers used here
+        rows = ChangeSequence.objects.bulk_create([ChangeSequence() for _ in batch])
+        ChangeSequence.objects.filter(pk__in=[row.pk for row in rows]).delete()
+        Post.objects.bulk_update([Post(pk=pk, change_seq=row.pk) for pk, row in zip(batch, rows)],
+                                 ['change_seq'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_related_posts'),
+    ]
+
+    operations = [
+        migrations.RunPython(number_existing_posts, migrations.RunPython.noop),
+    ]
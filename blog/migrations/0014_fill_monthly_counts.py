@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_monthly_counts(apps, schema_editor):
+    """Count the posts published before 0011, as `manage.py rebuild_monthly_counts` does."""
+    Post = apps.get_model('blog', 'Post')
+    MonthlyPostCount = apps.get_model('blog', 'MonthlyPostCount')
+    rows = (
+        Post.objects.filter(status='published', published_at__isnull=False).order_by()
+        .annotate(year=ExtractYear('published_at'), month=ExtractMonth('published_at'))
+        .values('year', 'month', 'category_id').annotate(count=Count('id'))
+    )
+    MonthlyPostCount.objects.all().delete()
+    MonthlyPostCount.objects.bulk_create(MonthlyPostCount(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_backfill_change_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_monthly_counts, migrations.RunPython.noop),
+    ]
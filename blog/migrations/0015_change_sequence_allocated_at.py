@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 18:44
+
+from datetime import datetime, timezone
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def settle_existing_numbers(apps, schema_editor):
+    """Leave one settled row past every number handed out so far, so sync can return them."""
+    ChangeSequence = apps.get_model('blog', 'ChangeSequence')
+    ChangeSequence.objects.create(allocated_at=datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_fill_monthly_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='allocated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(settle_existing_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 18:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_read_merged_authors(apps, schema_editor):
+    """Posts of former prolific authors were never fanned out, so keep merging them at read time."""
+    ProlificAuthor = apps.get_model('blog', 'ProlificAuthor')
+    PopularAuthor = apps.get_model('blog', 'PopularAuthor')
+    PopularAuthor.objects.bulk_create([
+        PopularAuthor(author_id=author_id) for author_id in ProlificAuthor.objects.values_list('author_id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_change_sequence_allocated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedFanOut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PopularAuthor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(auto_now_add=True)),
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='popular_marker', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PopularCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(auto_now_add=True)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='popular_marker', to='blog.category')),
+            ],
+        ),
+        migrations.RunPython(keep_read_merged_authors, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ProlificAuthor',
+        ),
+    ]
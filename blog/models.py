@@ -1,7 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
 
 from django.contrib.auth.models import User
-from django.utils.text import slugify
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator, slugify
+
+EXCERPT_WORDS = 40
+WORDS_PER_MINUTE = 200
+
+
+def content_stats(content):
+    """Return (excerpt, word_count, reading_time) for a post body."""
+    words = strip_tags(content or '').split()
+    word_count = len(words)
+    excerpt = Truncator(' '.join(words)).words(EXCERPT_WORDS)
+    reading_time = max(1, -(-word_count // WORDS_PER_MINUTE)) if word_count else 0
+    return excerpt, word_count, reading_time
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -21,6 +38,54 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+class ChangeSequence(models.Model):
+    """
+    Allocator for the monotonic change sequence used by the sync endpoint.
+
+    Only the never-reused auto-increment id matters; unlike a single counter
+    row this never makes concurrent writers wait on one hot row.
+
+    Numbers are taken before the writer commits, so commits can land out of
+    order: a client may read seq N+1 while N is still in flight. The sync
+    endpoint therefore only hands out cursors up to `committed_watermark()`,
+    the newest number allocated more than BLOG_SYNC_SETTLE_SECONDS ago.
+    Rows are kept that long and pruned in batches afterwards.
+    """
+
+    allocated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Prune old rows whenever allocation crosses a multiple of this
+    PRUNE_EVERY = 1000
+    # Rows older than this are no longer needed for the watermark, except the newest of them
+    PRUNE_AFTER = timedelta(hours=1)
+
+    @classmethod
+    def next(cls):
+        return cls.allocate(1)[0]
+
+    @classmethod
+    def allocate(cls, count):
+        """`count` increasing numbers in one query."""
+        rows = cls.objects.bulk_create([cls() for _ in range(count)])
+        pks = [row.pk for row in rows]
+        if pks[-1] % cls.PRUNE_EVERY < count:
+            cls.prune()
+        return pks
+
+    @classmethod
+    def prune(cls):
+        old = cls.objects.filter(allocated_at__lt=timezone.now() - cls.PRUNE_AFTER)
+        newest = old.aggregate(pk=models.Max('pk'))['pk']
+        if newest is not None:
+            old.filter(pk__lt=newest).delete()
+
+    @classmethod
+    def committed_watermark(cls):
+        """Highest number whose writer has had BLOG_SYNC_SETTLE_SECONDS to commit."""
+        settled = timezone.now() - timedelta(seconds=settings.BLOG_SYNC_SETTLE_SECONDS)
+        return cls.objects.filter(allocated_at__lte=settled).aggregate(pk=models.Max('pk'))['pk'] or 0
+
+
 class Post(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -42,14 +107,106 @@ class Post(models.Model):
     published_at = models.DateTimeField(null=True, blank=True)
     likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
     dislikes = models.ManyToManyField(User, related_name='disliked_posts', blank=True)
+    # Derived from content on save so list views don't need to ship the body
+    excerpt = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)  # minutes
+    # Flushed periodically from the cache counters in blog/counters.py
+    views = models.PositiveBigIntegerField(default=0, editable=False)
+    # Set by blog/archive.py once cold comments/reactions were moved out
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
+    archived_comment_count = models.PositiveIntegerField(default=0, editable=False)
+    archived_like_count = models.PositiveIntegerField(default=0, editable=False)
+    archived_dislike_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped on every change visible to sync clients (see PostViewSet.changes)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
     
+    # Fields whose previous value signal handlers need to detect transitions
+    TRACKED_FIELDS = ('status', 'title', 'category_id', 'published_at')
+    # The rest of what sync clients see; a save that changes none of these keeps change_seq
+    SYNCED_FIELDS = TRACKED_FIELDS + ('slug', 'content', 'author_id', 'archived_at', 'archived_comment_count',
+                                      'archived_like_count', 'archived_dislike_count')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='blog_post_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='blog_post_status_created_idx'),
+            models.Index(fields=['author', 'status', '-published_at'], name='blog_post_author_pub_idx'),
+            models.Index(fields=['status', '-published_at'], name='blog_post_status_pub_idx'),
+        ]
     
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        return {field: self.__dict__.get(field) for field in self.SYNCED_FIELDS}
+
+    def has_synced_changes(self, update_fields=None):
+        """Whether saving now changes anything a sync client would see."""
+        if self._state.adding or not hasattr(self, '_loaded_values'):
+            return True
+        # Still-deferred fields are not saved; ones loaded since count as changed, which is harmless
+        fields = [field for field in self.SYNCED_FIELDS if field in self.__dict__]
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(name).attname for name in update_fields}
+            fields = [field for field in fields if field in update_fields]
+        return any(self.__dict__[field] != self._loaded_values[field] for field in fields)
+
+    def previous_value(self, field):
+        """Value of a tracked field as last loaded/saved; None for new posts."""
+        return getattr(self, '_loaded_values', {}).get(field)
+
+    @classmethod
+    def bump_change_seq(cls, post_ids):
+        """Mark posts as changed for sync clients, e.g. after their counts moved."""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        seqs = ChangeSequence.allocate(len(post_ids))
+        cls.objects.filter(pk__in=post_ids).update(change_seq=models.Case(
+            *[models.When(pk=post_id, then=models.Value(seq)) for post_id, seq in zip(post_ids, seqs)],
+            default=models.F('change_seq'),
+            output_field=models.BigIntegerField(),
+        ))
+
+    def total_comments(self):
+        return self.comments.filter(approved=True).count() + self.archived_comment_count
+
+    def total_likes(self):
+        return self.likes.count() + self.archived_like_count
+
+    def total_dislikes(self):
+        return self.dislikes.count() + self.archived_dislike_count
+
+    def update_content_stats(self):
+        self.excerpt, self.word_count, self.reading_time = content_stats(self.content)
     
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            if 'content' not in self.get_deferred_fields():
+                self.update_content_stats()
+        elif 'content' in update_fields:
+            self.update_content_stats()
+            kwargs['update_fields'] = set(update_fields) | {'excerpt', 'word_count', 'reading_time'}
+
+        if self.status == 'published' and not self.published_at:
+            self.published_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'published_at'}
+
+        if self.has_synced_changes(kwargs.get('update_fields')):
+            self.change_seq = ChangeSequence.next()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'change_seq'}
+
         if not self.slug:
             base_slug = slugify(self.title)
             self.slug = base_slug
@@ -60,6 +217,7 @@ class Post(models.Model):
                 counter += 1
                                     
         super().save(*args, **kwargs)
+        self._loaded_values = self.tracked_values()
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
@@ -71,7 +229,202 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='blog_comment_created_idx'),
+            models.Index(fields=['approved', 'created_at'], name='blog_comment_approved_idx'),
+        ]
     
     def __str__(self):
         return f'Comment by {self.name} on {self.post}'
+
+
+class ArchivedComment(models.Model):
+    """Approved comment of an old post, moved out of blog_comment by blog/archive.py."""
+    # Keeps the original Comment id so API clients see the same ids
+    id = models.BigIntegerField(primary_key=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='archived_comments')
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    approved = models.BooleanField(default=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['post', 'created_at'], name='blog_archcomment_post_idx')]
+
+    def __str__(self):
+        return f'Archived comment by {self.name} on {self.post_id}'
+
+
+class ArchivedReaction(models.Model):
+    """Like or dislike of an old post, moved out of the likes/dislikes through tables."""
+    LIKE = 'like'
+    DISLIKE = 'dislike'
+    KIND_CHOICES = (
+        (LIKE, 'Like'),
+        (DISLIKE, 'Dislike'),
+    )
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='archived_reactions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_reactions')
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'user', 'kind'], name='blog_archreaction_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} by {self.user_id} on {self.post_id}'
+
+
+class PostTombstone(models.Model):
+    """Tells sync clients a post was deleted or unpublished."""
+    DELETED = 'deleted'
+    UNPUBLISHED = 'unpublished'
+    REASON_CHOICES = (
+        (DELETED, 'Deleted'),
+        (UNPUBLISHED, 'Unpublished'),
+    )
+
+    post_id = models.BigIntegerField()
+    slug = models.SlugField(max_length=200)
+    reason = models.CharField(max_length=11, choices=REASON_CHOICES)
+    change_seq = models.BigIntegerField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['change_seq']
+
+    def __str__(self):
+        return f'Post {self.post_id} {self.reason}'
+
+
+class AuthorFollow(models.Model):
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_authors')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='author_followers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'author'], name='blog_authorfollow_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows author {self.author_id}'
+
+
+class CategoryFollow(models.Model):
+    follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_categories')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='followers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'category'], name='blog_categoryfollow_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows category {self.category_id}'
+
+
+class PopularAuthor(models.Model):
+    """Authors with too many followers to fan out to; their posts are merged into feeds at read time."""
+    author = models.OneToOneField(User, on_delete=models.CASCADE, related_name='popular_marker')
+    since = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Popular author {self.author_id}'
+
+
+class PopularCategory(models.Model):
+    """Categories with too many followers to fan out to; merged into feeds at read time."""
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='popular_marker')
+    since = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Popular category {self.category_id}'
+
+
+class FeedFanOut(models.Model):
+    """A post whose feed entries need (re)writing, queued with the save and drained by process_feed_fanout."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Fan out post {self.post_id}'
+
+
+class FeedEntry(models.Model):
+    """One row per (user, post) in a user's precomputed home timeline."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    published_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='blog_feedentry_unique'),
+        ]
+        indexes = [
+            # Every feed page is one range scan of this index
+            models.Index(fields=['user', '-published_at', '-post'], name='blog_feedentry_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in feed of {self.user_id}'
+
+
+class MonthlyPostCount(models.Model):
+    """Published posts per month and category, kept current by blog/monthly.py."""
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='monthly_counts')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-year', '-month']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'month', 'category'], condition=models.Q(category__isnull=False),
+                                    name='blog_monthlypostcount_unique'),
+            # NULLs never collide in a unique index, so uncategorized rows need their own
+            models.UniqueConstraint(fields=['year', 'month'], condition=models.Q(category__isnull=True),
+                                    name='blog_monthlypostcount_uncategorized_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} ({self.category_id}): {self.count}'
+
+
+class RelatedPost(models.Model):
+    """Top-K precomputed recommendations for a post, written by blog/related.py."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['post', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='blog_relatedpost_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['post', 'rank'], name='blog_relatedpost_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.related_id} related to {self.post_id} ({self.score:.3f})'
+
+
+class BatchWatermark(models.Model):
+    """Last Post.change_seq an incremental batch job has processed."""
+    name = models.CharField(max_length=50, unique=True)
+    change_seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} @ {self.change_seq}'
 # Create your models here.
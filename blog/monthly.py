@@ -0,0 +1,92 @@
+"""
+Per-month counts of published posts for the date archive.
+
+MonthlyPostCount holds one row per (year, month, category). Signal
+handlers move a post between buckets as it is published, unpublished,
+re-dated, re-categorised or deleted, so the archive endpoint only reads
+this small table. `manage.py rebuild_monthly_counts` recomputes it from
+the posts, e.g. after bulk imports that bypass the signals.
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, Greatest
+from django.utils import timezone
+
+from .models import MonthlyPostCount, Post
+
+
+def bucket(status, published_at, category_id):
+    """(year, month, category_id) a post counts towards, or None."""
+    if status != 'published' or published_at is None:
+        return None
+    local = timezone.localtime(published_at)
+    return local.year, local.month, category_id
+
+
+def adjust(key, delta):
+    if key is None:
+        return
+    year, month, category_id = key
+    rows = MonthlyPostCount.objects.filter(year=year, month=month, category_id=category_id)
+    # Counts that drifted low (e.g. posts imported without signals) stop at zero instead of
+    # failing the count >= 0 check; rebuild_monthly_counts corrects them
+    if rows.update(count=Greatest(F('count') + delta, 0)) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            MonthlyPostCount.objects.create(year=year, month=month, category_id=category_id, count=delta)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(count=F('count') + delta)
+
+
+def post_saved(post):
+    old = bucket(post.previous_value('status'), post.previous_value('published_at'),
+                 post.previous_value('category_id'))
+    new = bucket(post.status, post.published_at, post.category_id)
+    if old != new:
+        adjust(old, -1)
+        adjust(new, 1)
+
+
+def post_deleted(post):
+    adjust(bucket(post.previous_value('status'), post.previous_value('published_at'),
+                  post.previous_value('category_id')), -1)
+
+
+def category_deleted(category_id):
+    """Fold a category's counts into the uncategorized rows its posts move to."""
+    for year, month, count in MonthlyPostCount.objects.filter(category_id=category_id).values_list(
+            'year', 'month', 'count'):
+        adjust((year, month, None), count)
+
+
+def rebuild():
+    rows = (
+        Post.objects.filter(status='published', published_at__isnull=False).order_by()
+        .annotate(year=ExtractYear('published_at'), month=ExtractMonth('published_at'))
+        .values('year', 'month', 'category_id').annotate(count=Count('id'))
+    )
+    with transaction.atomic():
+        MonthlyPostCount.objects.all().delete()
+        MonthlyPostCount.objects.bulk_create(MonthlyPostCount(**row) for row in rows)
+    return MonthlyPostCount.objects.count()
+
+
+def months(category_id=None):
+    """[{'year', 'month', 'count'}, ...] newest first, overall or for one category."""
+    rows = MonthlyPostCount.objects.filter(count__gt=0)
+    if category_id is not None:
+        rows = rows.filter(category_id=category_id)
+    totals = rows.values('year', 'month').annotate(total=Sum('count')).order_by('-year', '-month')
+    return [{'year': row['year'], 'month': row['month'], 'count': row['total']} for row in totals]
+
+
+def month_range(year, month):
+    """[start, end) of a calendar month in the current time zone."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime(year, month, 1), tz)
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1), tz)
+    return start, end
@@ -0,0 +1,19 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+class MessagePackParser(BaseParser):
+    """Parses `application/msgpack` request bodies."""
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError('MessagePack parse error - %s' % exc)
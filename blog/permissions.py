@@ -1,7 +1,19 @@
+from hmac import compare_digest
+
+from django.conf import settings
 from rest_framework import permissions
 
 class IsAuthenticatedForLikeDislike(permissions.BasePermission):
     def has_permission(self, request, view):
         if view.action in ['toggle_like', 'toggle_dislike']:
             return request.user and request.user.is_authenticated
-        return True
\ No newline at end of file
+        return True
+
+
+class IsStaffOrMetricsToken(permissions.BasePermission):
+    def has_permission(self, request, view):
+        token = settings.BLOG_METRICS_TOKEN
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return True
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,171 @@
+"""
+Related posts from co-likes and category overlap.
+
+For each target post the users who liked it are looked up, then every
+other post those users liked; the number of shared likers gives a cosine
+similarity  co(a, b) / sqrt(likes(a) * likes(b))  over the sparse
+post x user like matrix. It is blended with a bonus for sharing a category
+(recent posts of the same category are candidates too, so posts without
+likes still get recommendations), and the top-K are stored as RelatedPost
+rows. Likes moved to the archive tables count as well.
+
+A full build processes every published post. An incremental build redoes
+posts whose change_seq moved past the stored watermark (likes and edits
+both bump it) plus every post their likers liked, since a new like shifts
+the co-like scores of those too. Category candidates of untouched posts
+still only move on a full build, so run one periodically (e.g. nightly).
+"""
+from collections import defaultdict
+from math import sqrt
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import ArchivedReaction, BatchWatermark, Post, RelatedPost
+
+WATERMARK = 'related_posts'
+LIKE_WEIGHT = 0.7
+CATEGORY_WEIGHT = 0.3
+# Heavy likers add many pairs but little signal; only their latest likes count
+MAX_LIKES_PER_USER = 500
+CATEGORY_CANDIDATES = 20
+BATCH_SIZE = 500
+IN_CHUNK = 1000
+
+_through = Post.likes.through
+
+
+def _chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _likes_of_posts(post_ids):
+    """[(post_id, user_id)] for live and archived likes of `post_ids`."""
+    rows = list(_through.objects.filter(post_id__in=post_ids).values_list('post_id', 'user_id'))
+    rows += ArchivedReaction.objects.filter(post_id__in=post_ids, kind=ArchivedReaction.LIKE).values_list(
+        'post_id', 'user_id')
+    return rows
+
+
+def _likes_of_users(user_ids):
+    """{user_id: [post_id, ...]} of published posts liked by `user_ids`, newest like first."""
+    liked = defaultdict(list)
+    for chunk in _chunks(user_ids, IN_CHUNK):
+        live = (_through.objects.filter(user_id__in=chunk, post__status='published')
+                .order_by('user_id', '-id').values_list('user_id', 'post_id'))
+        archived = (ArchivedReaction.objects.filter(user_id__in=chunk, kind=ArchivedReaction.LIKE,
+                                                    post__status='published')
+                    .order_by('user_id', '-archived_at').values_list('user_id', 'post_id'))
+        for user_id, post_id in list(live) + list(archived):
+            if len(liked[user_id]) < MAX_LIKES_PER_USER:
+                liked[user_id].append(post_id)
+    return liked
+
+
+def _post_info(post_ids):
+    """{post_id: (like_count, category_id)} for published `post_ids`."""
+    info = {}
+    for chunk in _chunks(post_ids, IN_CHUNK):
+        rows = (Post.objects.filter(pk__in=chunk, status='published')
+                .annotate(live_likes=Count('likes')).values_list('id', 'live_likes', 'archived_like_count', 'category_id'))
+        for post_id, live, archived, category_id in rows:
+            info[post_id] = (live + archived, category_id)
+    return info
+
+
+def _category_candidates(category_ids):
+    """{category_id: [post_id, ...]} of the most recent published posts per category."""
+    candidates = {}
+    for category_id in category_ids:
+        candidates[category_id] = list(
+            Post.objects.filter(category_id=category_id, status='published')
+            .order_by('-published_at').values_list('id', flat=True)[:CATEGORY_CANDIDATES]
+        )
+    return candidates
+
+
+def _co_liked(post_ids):
+    """Published posts liked by anyone who liked one of `post_ids`."""
+    user_ids = set()
+    for chunk in _chunks(post_ids, IN_CHUNK):
+        user_ids.update(user_id for _, user_id in _likes_of_posts(chunk))
+    return {post_id for liked in _likes_of_users(user_ids).values() for post_id in liked}
+
+
+def score_batch(target_ids, top_k):
+    """{target_id: [(related_id, score), ...]} best first."""
+    likers = defaultdict(set)
+    for post_id, user_id in _likes_of_posts(target_ids):
+        likers[post_id].add(user_id)
+    user_likes = _likes_of_users({user_id for users in likers.values() for user_id in users})
+
+    co_likes = defaultdict(lambda: defaultdict(int))
+    for target_id, users in likers.items():
+        for user_id in users:
+            for other_id in user_likes.get(user_id, ()):
+                if other_id != target_id:
+                    co_likes[target_id][other_id] += 1
+
+    targets = _post_info(target_ids)
+    by_category = _category_candidates({category_id for _, category_id in targets.values() if category_id})
+    candidate_ids = {other for others in co_likes.values() for other in others}
+    candidate_ids |= {post_id for post_ids in by_category.values() for post_id in post_ids}
+    info = _post_info(candidate_ids - set(targets)) | targets
+
+    results = {}
+    for target_id, (likes, category_id) in targets.items():
+        scores = {}
+        candidates = set(co_likes[target_id]) | set(by_category.get(category_id, ()))
+        for other_id in candidates - {target_id}:
+            if other_id not in info:
+                continue
+            other_likes, other_category = info[other_id]
+            shared = co_likes[target_id].get(other_id, 0)
+            # Counts are read after the likers, so a concurrent unlike can leave them at 0
+            denominator = sqrt(likes * other_likes)
+            cosine = min(shared / denominator, 1.0) if shared and denominator else 0.0
+            same_category = 1.0 if category_id and category_id == other_category else 0.0
+            scores[other_id] = LIKE_WEIGHT * cosine + CATEGORY_WEIGHT * same_category
+        best = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:top_k]
+        results[target_id] = [(other_id, score) for other_id, score in best if score > 0]
+    return results
+
+
+def build(incremental=False, top_k=None):
+    """Recompute related posts; returns the number of posts processed."""
+    top_k = top_k or settings.BLOG_RELATED_POSTS
+    watermark, _ = BatchWatermark.objects.get_or_create(name=WATERMARK)
+    # Read before scoring: changes made while the job runs are picked up next time
+    high_water = Post.objects.aggregate(seq=Max('change_seq'))['seq'] or 0
+
+    target_ids = Post.objects.filter(status='published').order_by('pk').values_list('pk', flat=True)
+    if incremental:
+        changed = set(target_ids.filter(change_seq__gt=watermark.change_seq))
+        target_ids = sorted(changed | _co_liked(changed))
+    processed = 0
+    for batch in _chunks(target_ids, BATCH_SIZE):
+        results = score_batch(batch, top_k)
+        with transaction.atomic():
+            RelatedPost.objects.filter(post_id__in=batch).delete()
+            RelatedPost.objects.bulk_create(
+                RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+                for post_id, related in results.items()
+                for rank, (related_id, score) in enumerate(related)
+            )
+        processed += len(batch)
+
+    watermark.change_seq = high_water
+    watermark.save(update_fields=['change_seq', 'updated_at'])
+    return processed
+
+
+def related_for(post):
+    """Stored recommendations of `post` that are still published, in one joined query."""
+    entries = (RelatedPost.objects.filter(post=post, related__status='published')
+               .select_related('related').order_by('rank')
+               .only('score', 'related', 'related__id', 'related__title', 'related__slug', 'related__excerpt',
+                     'related__published_at'))
+    return [entry.related for entry in entries]
@@ -0,0 +1,80 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional accelerator
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+if orjson is not None:
+    # Datetimes go through the DRF encoder so they keep the trailing 'Z'
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer.
+
+    Uses orjson when it is installed and a reused stdlib encoder otherwise.
+    Output is byte-for-byte the same as JSONRenderer for compact responses;
+    indented output (browsable API, `; indent=N`) is delegated to the parent.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = self.encoder_class(
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=(',', ':') if self.compact else (', ', ': '),
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if orjson is not None and self.compact and not self.ensure_ascii:
+            try:
+                ret = orjson.dumps(data, default=self._encoder.default, option=ORJSON_OPTIONS)
+            except (orjson.JSONEncodeError, TypeError):
+                # e.g. integers wider than 64 bits: let the stdlib handle it
+                pass
+            else:
+                return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        ret = self._encoder.encode(data)
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders responses as MessagePack when the client sends `Accept: application/msgpack`."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+_json_encoder = encoders.JSONEncoder()
+
+
+def _msgpack_default(obj):
+    # Reuse DRF's rules for datetimes, decimals, UUIDs, lazy strings...
+    value = _json_encoder.default(obj)
+    if isinstance(value, tuple):
+        return list(value)
+    return value
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Category, Post, Comment
+from .models import ArchivedReaction, Category, Post, Comment
+from . import archive, counters, related
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 
@@ -46,74 +47,104 @@ class PostListSerializer(serializers.ModelSerializer):
         model = Post
         fields = ['id', 'title', 'slug','content', 'author', 'category', 'status', 
                  'created_at', 'updated_at', 'published_at', 'comment_count',
-                 'like_count', 'dislike_count', 'user_has_liked', 'user_has_disliked']
-        read_only_fields = ['slug']
+                 'like_count', 'dislike_count', 'user_has_liked', 'user_has_disliked',
+                 'excerpt', 'word_count', 'reading_time']
+        read_only_fields = ['slug', 'excerpt', 'word_count', 'reading_time']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Lightweight mode: clients get the excerpt instead of the full body
+        if self.context.get('lite'):
+            self.fields.pop('content', None)
     
     def get_comment_count(self, obj):
-        return obj.comments.filter(approved=True).count()
+        return obj.total_comments()
 
     def get_like_count(self, obj):
-        return obj.likes.count()
+        return obj.total_likes()
     
     def get_dislike_count(self, obj):
-        return obj.dislikes.count()
+        return obj.total_dislikes()
 
     def get_user_has_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
+            return (obj.likes.filter(id=request.user.id).exists()
+                    or archive.has_archived_reaction(obj, request.user, ArchivedReaction.LIKE))
         return False
 
     def get_user_has_disliked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.dislikes.filter(id=request.user.id).exists()
+            return (obj.dislikes.filter(id=request.user.id).exists()
+                    or archive.has_archived_reaction(obj, request.user, ArchivedReaction.DISLIKE))
         return False
 
+class RelatedPostSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Post
+        fields = ['id', 'title', 'slug', 'excerpt', 'published_at']
+
+
 class PostDetailSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     comments = serializers.SerializerMethodField()
+    views = serializers.SerializerMethodField()
     like_count = serializers.SerializerMethodField()
     dislike_count = serializers.SerializerMethodField()
     user_has_liked = serializers.SerializerMethodField()
     user_has_disliked = serializers.SerializerMethodField()
+    related_posts = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
         fields = ['id', 'title', 'slug', 'content', 'author', 'category', 
                   'status', 'created_at', 'updated_at', 'published_at', 
                   'comments', 'like_count', 'dislike_count',
-                  'user_has_liked', 'user_has_disliked']
-        read_only_fields = ['slug']
+                  'user_has_liked', 'user_has_disliked',
+                  'excerpt', 'word_count', 'reading_time', 'views', 'related_posts']
+        read_only_fields = ['slug', 'excerpt', 'word_count', 'reading_time']
     
     def get_comments(self, obj):
-        comments = obj.comments.filter(approved=True)
+        # Includes comments moved to the archive for old posts
+        comments = archive.approved_comments(obj)
         return CommentSerializer(comments, many=True).data
 
+    def get_related_posts(self, obj):
+        # Precomputed by `manage.py build_related_posts`
+        return RelatedPostSerializer(related.related_for(obj), many=True).data
+
+    def get_views(self, obj):
+        # Stored count plus views not flushed to the database yet (only this worker's without a shared cache)
+        return obj.views + counters.pending_views(obj.pk)
+
     def get_like_count(self, obj):
-        return obj.likes.count()
+        return obj.total_likes()
 
     def get_user_has_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
+            return (obj.likes.filter(id=request.user.id).exists()
+                    or archive.has_archived_reaction(obj, request.user, ArchivedReaction.LIKE))
         return False        
 
 
     def get_dislike_count(self, obj):
-        return obj.dislikes.count()
+        return obj.total_dislikes()
 
     def get_user_has_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
+            return (obj.likes.filter(id=request.user.id).exists()
+                    or archive.has_archived_reaction(obj, request.user, ArchivedReaction.LIKE))
         return False
 
     def get_user_has_disliked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.dislikes.filter(id=request.user.id).exists()
+            return (obj.dislikes.filter(id=request.user.id).exists()
+                    or archive.has_archived_reaction(obj, request.user, ArchivedReaction.DISLIKE))
         return False
 
 class PostCreateUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,120 @@
+"""
+Model signal handlers that keep derived data in step with posts.
+
+Post.from_db()/save() record the last persisted values of Post.TRACKED_FIELDS,
+so handlers can tell a publish from an edit via `previous_value()`.
+Side effects run on commit so a rolled back save leaves nothing behind.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import archive, autocomplete, feed, monthly, syndication
+from .models import Category, ChangeSequence, FeedFanOut, Post, PostTombstone
+
+
+def was_published(post):
+    return post.previous_value('status') == 'published'
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog.post_saved.feed')
+def update_feeds(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    published = instance.status == 'published'
+    moved = instance.previous_value('category_id') != instance.category_id
+    if published and (not was_published(instance) or moved):
+        # Queued with the save and written by process_feed_fanout, off the request
+        FeedFanOut.objects.create(post=instance)
+    # robust: the post is saved either way; a failed feed update must not turn that into a 500
+    elif was_published(instance) and not published:
+        transaction.on_commit(lambda: feed.retract(instance), robust=True)
+    elif published and instance.previous_value('published_at') != instance.published_at:
+        post_id, published_at = instance.pk, instance.published_at
+        transaction.on_commit(lambda: feed.redate(post_id, published_at), robust=True)
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog.post_saved.tombstone')
+def tombstone_unpublished(sender, instance, created, raw=False, **kwargs):
+    if not raw and was_published(instance) and instance.status != 'published':
+        PostTombstone.objects.create(post_id=instance.pk, slug=instance.slug,
+                                     reason=PostTombstone.UNPUBLISHED,
+                                     change_seq=ChangeSequence.next())
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='blog.post_deleted.tombstone')
+def tombstone_deleted(sender, instance, **kwargs):
+    # Sync clients never saw drafts, and a tombstone would publish their slug
+    if not was_published(instance):
+        return
+    PostTombstone.objects.create(post_id=instance.pk, slug=instance.slug,
+                                 reason=PostTombstone.DELETED,
+                                 change_seq=ChangeSequence.next())
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog.post_saved.syndication')
+def refresh_syndication(sender, instance, created, raw=False, **kwargs):
+    if raw or not (instance.status == 'published' or was_published(instance)):
+        return
+    category_ids = {instance.category_id, instance.previous_value('category_id')}
+    transaction.on_commit(lambda: syndication.invalidate(category_ids))
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='blog.post_deleted.syndication')
+def refresh_syndication_on_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        category_id = instance.category_id
+        transaction.on_commit(lambda: syndication.invalidate({category_id}))
+
+
+@receiver([post_save, post_delete], sender=Category, dispatch_uid='blog.category_changed.syndication')
+def refresh_category_syndication(sender, instance, raw=False, **kwargs):
+    # Deleting a category moves its posts to the uncategorized segment
+    if not raw:
+        category_id = instance.pk
+        transaction.on_commit(lambda: syndication.invalidate({category_id, None}))
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog.post_saved.autocomplete')
+def refresh_autocomplete(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    published = instance.status == 'published'
+    renamed = published and instance.previous_value('title') != instance.title
+    if published != was_published(instance) or renamed:
+        transaction.on_commit(autocomplete.invalidate)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='blog.post_deleted.autocomplete')
+def refresh_autocomplete_on_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        transaction.on_commit(autocomplete.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Category, dispatch_uid='blog.category_changed.autocomplete')
+def refresh_category_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(autocomplete.invalidate)
+
+
+@receiver(post_save, sender=Post, dispatch_uid='blog.post_saved.monthly')
+def update_monthly_counts(sender, instance, created, raw=False, **kwargs):
+    # Same transaction as the save, so the counts never drift on rollback
+    if not raw:
+        monthly.post_saved(instance)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='blog.post_deleted.monthly')
+def update_monthly_counts_on_delete(sender, instance, **kwargs):
+    monthly.post_deleted(instance)
+
+
+@receiver(pre_delete, sender=Category, dispatch_uid='blog.category_deleted.monthly')
+def move_monthly_counts(sender, instance, **kwargs):
+    monthly.category_deleted(instance.pk)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='blog.user_deleted.archive')
+def forget_archived_reactions(sender, instance, **kwargs):
+    archive.forget_user(instance.pk)
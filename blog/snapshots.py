@@ -0,0 +1,99 @@
+"""
+Pre-rendered JSON of the front page endpoints.
+
+publish() renders what an anonymous client gets from
+/api/posts/?status=published&lite=true (the newest
+settings.BLOG_SNAPSHOT_POSTS) and /api/categories/ into content-hashed
+files (plus .gz, and .br when brotli is installed) under
+settings.BLOG_SNAPSHOT_DIR, then points manifest.json at them.
+SnapshotWhiteNoiseMiddleware serves the hashed files as immutable static
+assets, so front page reads never reach a Django view. Publishing is left
+to a single scheduler, `manage.py publish_snapshots --interval N`, rather
+than to the web workers; a run whose files are unchanged leaves the
+manifest alone.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import fastpaths
+from .models import Category, Post
+from .renderers import FastJSONRenderer
+
+MANIFEST = 'manifest.json'
+# Files of older generations stay available to clients holding an old manifest
+RETENTION = 3600
+
+_hashed_name = re.compile(r'^[a-z]+\.[0-9a-f]{12}\.json(\.gz|\.br)?$')
+
+
+def is_hashed(filename):
+    return _hashed_name.match(filename) is not None
+
+
+def render(name):
+    """Body an anonymous client gets from the endpoint, built from the same rows as the list views."""
+    if name == 'posts':
+        posts = Post.objects.filter(status='published')[:settings.BLOG_SNAPSHOT_POSTS]
+        data = fastpaths.post_list_rows(fastpaths.post_list_values(posts, lite=True), lite=True)
+    else:
+        data = fastpaths.category_rows(fastpaths.category_values(Category.objects.all()))
+    return FastJSONRenderer().render(data)
+
+
+def _write_atomic(path, data):
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def write_snapshot(directory, name, content):
+    filename = f'{name}.{hashlib.sha256(content).hexdigest()[:12]}.json'
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        # Compressed variants first: WhiteNoise looks for them when it first serves the file
+        _write_atomic(f'{path}.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if find_spec('brotli') is not None:
+            import brotli
+            _write_atomic(f'{path}.br', brotli.compress(content))
+        _write_atomic(path, content)
+    return filename
+
+
+def prune(directory, keep):
+    cutoff = time.time() - RETENTION
+    for filename in os.listdir(directory):
+        if not is_hashed(filename) or filename.split('.json')[0] + '.json' in keep:
+            continue
+        path = os.path.join(directory, filename)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def publish():
+    """Render every snapshot and switch manifest.json over to the new files if any changed."""
+    directory = settings.BLOG_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    files = {name: write_snapshot(directory, name, render(name)) for name in ('posts', 'categories')}
+    urls = {name: settings.BLOG_SNAPSHOT_URL + filename for name, filename in files.items()}
+
+    manifest_path = os.path.join(directory, MANIFEST)
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is None or manifest.get('files') != urls:
+        manifest = {'files': urls, 'generated_at': timezone.now().isoformat()}
+        _write_atomic(manifest_path, json.dumps(manifest).encode())
+    prune(directory, set(files.values()))
+    return manifest
@@ -0,0 +1,191 @@
+"""
+Sitemaps and RSS/Atom feeds of published posts.
+
+Every artifact (a kind plus a segment: all posts, one category or the
+uncategorized posts) is built once and kept in the cache with its ETag and
+Last-Modified. Both come from the content, so every rebuild and every
+worker's copy agree: Last-Modified is the newest updated_at in the segment
+or, if later, the newest post deletion/unpublish. The ETag stays the exact
+validator, e.g. for a post moving out of a segment. Sitemaps are generated URL by URL over a server-side cursor;
+feeds hold at most FEED_ITEMS entries and are written in one piece by
+feedgenerator. Signals in blog/signals.py drop only the segments a post
+change touches, and the next request rebuilds just those. With a
+per-process cache other workers only see the invalidation once their copy
+expires after settings.BLOG_SYNDICATION_TTL seconds; a shared cache makes
+it immediate everywhere.
+"""
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Category, Post, PostTombstone
+
+SITEMAP_INDEX = 'sitemap-index'
+SITEMAP = 'sitemap'
+RSS = 'rss'
+ATOM = 'atom'
+KINDS = (SITEMAP, RSS, ATOM)
+
+ALL = 'all'
+UNCATEGORIZED = 'uncategorized'
+
+FEED_ITEMS = 50
+# The sitemap protocol caps a single file at 50,000 URLs
+SITEMAP_MAX_URLS = 50000
+CHUNK_SIZE = 2000
+MAX_AGE = 300
+
+CONTENT_TYPES = {
+    SITEMAP_INDEX: 'application/xml; charset=utf-8',
+    SITEMAP: 'application/xml; charset=utf-8',
+    RSS: 'application/rss+xml; charset=utf-8',
+    ATOM: 'application/atom+xml; charset=utf-8',
+}
+
+
+def segment_for(category_id):
+    return f'category-{category_id}' if category_id else UNCATEGORIZED
+
+
+def cache_key(kind, segment):
+    return f'blog:syndication:v2:{kind}:{segment}'
+
+
+def invalidate(category_ids):
+    """Drop the artifacts affected by a change to posts of `category_ids` (None = uncategorized)."""
+    keys = [cache_key(SITEMAP_INDEX, ALL)]
+    for segment in [ALL] + [segment_for(category_id) for category_id in set(category_ids)]:
+        keys += [cache_key(kind, segment) for kind in KINDS]
+    cache.delete_many(keys)
+
+
+def post_url(slug):
+    return settings.BLOG_POST_URL_TEMPLATE.format(site=settings.BLOG_SITE_URL, slug=slug)
+
+
+def site_url(path):
+    return settings.BLOG_SITE_URL.rstrip('/') + path
+
+
+def segment_posts(segment):
+    posts = Post.objects.all()
+    if segment == UNCATEGORIZED:
+        return posts.filter(category__isnull=True)
+    if segment != ALL:
+        return posts.filter(category_id=int(segment.split('-', 1)[1]))
+    return posts
+
+
+def published_posts(segment):
+    return segment_posts(segment).filter(status='published')
+
+
+def last_modified(segment):
+    """Unix time of the newest change to the posts of `segment`, drafts included so unpublishing counts."""
+    changes = [
+        segment_posts(segment).aggregate(latest=Max('updated_at'))['latest'],
+        PostTombstone.objects.aggregate(latest=Max('created_at'))['latest'],
+    ]
+    changes = [changed for changed in changes if changed is not None]
+    return int(max(changes).timestamp()) if changes else 0
+
+
+def sitemap_chunks(segment):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    rows = (published_posts(segment).order_by('-published_at', '-id')
+            .values_list('slug', 'updated_at')[:SITEMAP_MAX_URLS])
+    for slug, updated_at in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield f'<url><loc>{escape(post_url(slug))}</loc><lastmod>{updated_at.isoformat()}</lastmod></url>\n'
+    yield '</urlset>\n'
+
+
+def sitemap_index_chunks(segment):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    latest = (Post.objects.filter(status='published').order_by()
+              .values_list('category_id').annotate(lastmod=Max('updated_at')))
+    slugs = dict(Category.objects.values_list('id', 'slug'))
+    for category_id, lastmod in latest.iterator(chunk_size=CHUNK_SIZE):
+        if category_id is None:
+            path = reverse('sitemap-uncategorized')
+        else:
+            path = reverse('sitemap-category', kwargs={'slug': slugs[category_id]})
+        yield f'<sitemap><loc>{escape(site_url(path))}</loc><lastmod>{lastmod.isoformat()}</lastmod></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def render_feed(kind, segment):
+    category = None
+    if segment.startswith('category-'):
+        category = Category.objects.get(pk=int(segment.split('-', 1)[1]))
+    if category is not None:
+        title, link = f'{category.name} posts', site_url(reverse(f'feed-category-{kind}', kwargs={'slug': category.slug}))
+    else:
+        title, link = 'Latest posts', site_url(reverse(f'feed-{kind}'))
+
+    generator = feedgenerator.Rss201rev2Feed if kind == RSS else feedgenerator.Atom1Feed
+    feed = generator(title=title, link=link, feed_url=link,
+                     description=category.description if category else 'Latest published posts')
+    posts = (published_posts(segment).select_related('author', 'category')
+             .only('title', 'slug', 'excerpt', 'published_at', 'updated_at',
+                   'author__username', 'category__name')
+             .order_by('-published_at', '-id')[:FEED_ITEMS])
+    for post in posts.iterator(chunk_size=FEED_ITEMS):
+        url = post_url(post.slug)
+        feed.add_item(title=post.title, link=url, description=post.excerpt, unique_id=url,
+                      pubdate=post.published_at, updateddate=post.updated_at,
+                      author_name=post.author.username,
+                      categories=[post.category.name] if post.category else ())
+    return feed.writeString('utf-8')
+
+
+def build(kind, segment):
+    if kind == SITEMAP_INDEX:
+        chunks = sitemap_index_chunks(segment)
+    elif kind == SITEMAP:
+        chunks = sitemap_chunks(segment)
+    else:
+        chunks = [render_feed(kind, segment)]
+
+    digest = hashlib.sha256()
+    parts = []
+    for chunk in chunks:
+        data = chunk.encode()
+        digest.update(data)
+        parts.append(data)
+    return {
+        'body': b''.join(parts),
+        'etag': f'"{digest.hexdigest()[:32]}"',
+        'last_modified': last_modified(segment),
+    }
+
+
+def get_artifact(kind, segment):
+    key = cache_key(kind, segment)
+    artifact = cache.get(key)
+    if artifact is None:
+        artifact = build(kind, segment)
+        # Signals drop it sooner, but only from the cache of the process that saw the change
+        cache.set(key, artifact, settings.BLOG_SYNDICATION_TTL)
+    return artifact
+
+
+def serve(request, kind, segment=ALL):
+    """Response for one artifact, honouring If-None-Match / If-Modified-Since."""
+    artifact = get_artifact(kind, segment)
+    response = get_conditional_response(request, etag=artifact['etag'], last_modified=artifact['last_modified'])
+    if response is None:
+        response = HttpResponse(artifact['body'], content_type=CONTENT_TYPES[kind])
+    response['ETag'] = artifact['etag']
+    response['Last-Modified'] = http_date(artifact['last_modified'])
+    response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+    return response
@@ -1,14 +1,40 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import decimal
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
 from rest_framework.authtoken.models import Token
-from .models import Category, Post
+from rest_framework.renderers import JSONRenderer
+from . import archive, autocomplete, counters, events, fastpaths, feed, metrics, monthly, related, snapshots, syndication
+from .cacheutils import incr
+from .models import (AuthorFollow, Category, CategoryFollow, ChangeSequence, Comment, FeedEntry, MonthlyPostCount,
+                     PopularAuthor, Post, RelatedPost)
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, PostDetailSerializer, PostListSerializer
+from .throttling import ConcurrencyLimiter, SlidingWindowThrottle
 
 class UserLoginTestCase(APITestCase):
     def setUp(self):
-      
+        cache.clear()
         Post.objects.all().delete()
         Category.objects.all().delete()
         User.objects.all().delete()
@@ -37,8 +63,40 @@ class UserLoginTestCase(APITestCase):
         token = response.data['token']
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
 
+    def test_login_attempts_are_throttled_per_username(self):
+        bad_credentials = {'username': 'testuser', 'password': 'wrong'}
+        # Mid-window, so the attempts cannot straddle a window boundary
+        clock = mock.patch.object(SlidingWindowThrottle, 'timer', lambda self: 1_000_050.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        for _ in range(10):
+            response = self.client.post(self.token_url, bad_credentials)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(self.token_url, self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_login_is_shed_when_hashing_slots_are_full(self):
+        cache.set('concurrency:password_hashing', 8, 30)
+        response = self.client.post(self.token_url, self.credentials)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(cache.get('concurrency:password_hashing'), 8)
+
+    def test_release_after_the_slot_counter_expired_stays_at_zero(self):
+        limiter = ConcurrencyLimiter('expiring', 2)
+        self.assertTrue(limiter.acquire())
+        cache.delete(limiter.key)
+        self.assertTrue(limiter.acquire())
+        limiter.release()
+        limiter.release()
+        self.assertEqual(cache.get(limiter.key), 0)
+
 class PostTestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         Post.objects.all().delete()
         Category.objects.all().delete()
         User.objects.all().delete()
@@ -170,6 +228,45 @@ class PostTestCase(APITestCase):
         self.assertEqual(response.data['title'], 'Post de prueba')
         self.assertEqual(response.data['author']['username'], self.user.username)
         
+    def test_post_views_are_counted_in_cache_and_flushed(self):
+        post = Post.objects.create(
+            title='Viewed post',
+            content='Content',
+            author=self.user,
+            category=self.category,
+            status='published'
+        )
+        url = reverse('post-detail', kwargs={'slug': post.slug})
+
+        seen = [self.client.get(url).data['views'] for _ in range(3)]
+        self.assertEqual(seen, [1, 2, 3])
+        # Only the first view flushed; the rest are pending in the cache
+        post.refresh_from_db()
+        self.assertEqual(post.views, 1)
+
+        self.assertEqual(counters.flush_views(), {post.pk: 2})
+        post.refresh_from_db()
+        self.assertEqual(post.views, 3)
+        self.assertEqual(counters.pending_views(post.pk), 0)
+
+    def test_late_log_entry_is_flushed_next_time(self):
+        late, other = [Post.objects.create(title=title, content='Content', author=self.user, status='published')
+                       for title in ('Late', 'Other')]
+        cache.set(counters.FLUSH_DUE_KEY, 1, 60)
+        # The writer for `late` took its seq but has not stored the log entry yet
+        seq = incr(cache, counters.LOG_SEQ_KEY, None)
+        cache.set(counters.PENDING_KEY % late.pk, 1)
+        counters.record_view(other)
+        self.assertEqual(counters.flush_views(), {other.pk: 1})
+
+        cache.set(counters.LOG_KEY % seq, late.pk)
+        self.assertEqual(counters.flush_views(), {late.pk: 1})
+        self.assertEqual(cache.get(counters.GAPS_KEY), [])
+
+    def test_flush_command_needs_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, 'BLOG_CACHE_URL'):
+            call_command('flush_post_views')
+
     def test_user_can_view_own_posts(self):
         # Create posts by the authenticated user
         Post.objects.create(
@@ -208,3 +305,949 @@ class PostTestCase(APITestCase):
         for post in response.data:
             self.assertEqual(post['author']['username'], self.user.username)
 
+    def test_post_content_stats_computed_on_save(self):
+        post = Post.objects.create(
+            title='Stats post',
+            content='<p>' + 'word ' * 450 + '</p>',
+            author=self.user,
+            category=self.category,
+            status='published'
+        )
+        self.assertEqual(post.word_count, 450)
+        self.assertEqual(post.reading_time, 3)
+        self.assertTrue(post.excerpt.startswith('word word'))
+        self.assertNotIn('<p>', post.excerpt)
+
+        post.content = 'Short body'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 2)
+        self.assertEqual(post.excerpt, 'Short body')
+
+    def test_list_posts_lite_mode(self):
+        Post.objects.create(
+            title='Lite post',
+            content='Some long content here',
+            author=self.user,
+            category=self.category,
+            status='published'
+        )
+        response = self.client.get(self.list_posts_url, {'lite': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('content', response.data[0])
+        self.assertEqual(response.data[0]['excerpt'], 'Some long content here')
+        self.assertEqual(response.data[0]['word_count'], 4)
+
+class FastJSONRendererTestCase(TestCase):
+    data = {
+        'id': 1,
+        'title': 'Caf\u00e9 \u2028 line',
+        'created_at': datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        'score': decimal.Decimal('1.50'),
+        'tags': ['a', 'b'],
+        'nested': {'empty': None, 'flag': True},
+    }
+
+    def test_matches_drf_json_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(FastJSONRenderer().render(self.data), expected)
+
+    def test_stdlib_fallback_matches_drf_json_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        with mock.patch('blog.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), expected)
+
+    def test_benchmark_uses_seeded_posts(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_renderers', rows=[2], iterations=1, stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('seed_blog', users=2, categories=1, posts=4, comments=2,
+                         fixture=os.path.join(directory, 'fixture.json'), stdout=StringIO())
+        out, err = StringIO(), StringIO()
+        call_command('bench_renderers', rows=[2], iterations=1, stdout=out, stderr=err)
+        self.assertIn('fast-json', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+
+    def test_indent_is_delegated(self):
+        rendered = FastJSONRenderer().render(self.data, 'application/json; indent=2')
+        self.assertIn(b'\n  ', rendered)
+
+
+class FastPathEquivalenceTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass', email='r@example.com')
+        author = User.objects.create_user(username='writer', password='pass', first_name='W')
+        category = Category.objects.create(name='Django', description='All about it')
+
+        liked = Post.objects.create(title='Liked', content='<b>Hello</b> world', author=author,
+                                    category=category, status='published',
+                                    published_at=datetime.datetime(2025, 5, 1, tzinfo=datetime.timezone.utc))
+        disliked = Post.objects.create(title='Disliked', content='Body', author=author, status='published')
+        Post.objects.create(title='Draft', content='', author=self.user, category=category)
+
+        liked.likes.add(self.user, author)
+        disliked.dislikes.add(self.user)
+        Comment.objects.create(post=liked, name='a', email='a@example.com', content='ok', approved=True)
+        Comment.objects.create(post=liked, name='b', email='b@example.com', content='pending')
+
+        archived = Post.objects.create(title='Archived', content='Old', author=author, status='published')
+        archived.likes.add(self.user)
+        archived.dislikes.add(author)
+        Comment.objects.create(post=archived, name='c', email='c@example.com', content='old', approved=True)
+        archive.archive_post_batch([archived.pk])
+        Comment.objects.create(post=archived, name='d', email='d@example.com', content='new', approved=True)
+
+    def assertSameJSON(self, expected, actual):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_post_list_rows_match_serializer(self):
+        for user in (self.user, AnonymousUser()):
+            for lite in (False, True):
+                request = SimpleNamespace(user=user)
+                queryset = Post.objects.all()
+                expected = PostListSerializer(queryset, many=True,
+                                              context={'request': request, 'lite': lite}).data
+                actual = fastpaths.post_list_rows(fastpaths.post_list_values(queryset, lite=lite),
+                                                  request, lite=lite)
+                self.assertSameJSON(expected, actual)
+
+    def test_category_rows_match_serializer(self):
+        queryset = Category.objects.all()
+        expected = CategorySerializer(queryset, many=True).data
+        actual = fastpaths.category_rows(fastpaths.category_values(queryset))
+        self.assertSameJSON(expected, actual)
+
+
+class CommentAdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass', email='a@example.com')
+        self.client.force_login(self.admin)
+        post = Post.objects.create(title='Commented', content='Body', author=self.admin, status='published')
+        for i in range(5):
+            Comment.objects.create(post=post, name=f'c{i}', email='c@example.com', content='hi')
+
+    def test_approve_comments_in_batches(self):
+        url = reverse('admin:blog_comment_changelist')
+        selected = list(Comment.objects.values_list('pk', flat=True)[:4])
+        with mock.patch('blog.admin.APPROVE_BATCH_SIZE', 2):
+            response = self.client.post(url, {
+                'action': 'approve_comments',
+                '_selected_action': selected,
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.filter(approved=True).count(), 4)
+
+    def test_changelist_loads(self):
+        response = self.client.get(reverse('admin:blog_comment_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+
+class ArchiveTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass')
+        self.post = Post.objects.create(title='Old post', content='Body', author=self.user, status='published')
+        Post.objects.filter(pk=self.post.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=400)
+        )
+        self.post.likes.add(self.user)
+        self.comment = Comment.objects.create(post=self.post, name='a', email='a@example.com',
+                                              content='old comment', approved=True)
+        Comment.objects.create(post=self.post, name='b', email='b@example.com', content='pending')
+
+    def test_archived_data_stays_readable(self):
+        list(archive.archive_cold_data(older_than_days=365))
+
+        self.assertEqual(self.post.likes.count(), 0)
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 1)  # pending stays hot
+
+        self.client.force_authenticate(self.user)
+        detail = self.client.get(reverse('post-detail', kwargs={'slug': self.post.slug})).data
+        self.assertEqual(detail['like_count'], 1)
+        self.assertTrue(detail['user_has_liked'])
+        self.assertEqual([c['id'] for c in detail['comments']], [self.comment.pk])
+
+        listed = self.client.get(reverse('post-list')).data[0]
+        self.assertEqual((listed['like_count'], listed['comment_count']), (1, 1))
+        self.assertTrue(listed['user_has_liked'])
+
+        comments = self.client.get(reverse('post-comments', kwargs={'slug': self.post.slug})).data
+        self.assertEqual(comments[0]['content'], 'old comment')
+
+    def test_later_runs_skip_archived_posts(self):
+        self.assertEqual([stats[0] for stats in archive.archive_cold_data(older_than_days=365)], [1])
+        fan = User.objects.create_user(username='fan', password='pass')
+        self.post.likes.add(fan)
+        self.assertEqual(list(archive.archive_cold_data(older_than_days=365)), [])
+
+        self.assertEqual(list(archive.archive_cold_data(older_than_days=365, include_archived=True)), [(1, 0, 1)])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.archived_like_count, 2)
+
+    def test_toggle_like_on_archived_post(self):
+        list(archive.archive_cold_data(older_than_days=365))
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post(reverse('post-toggle-like', kwargs={'slug': self.post.slug}))
+
+        self.assertEqual(response.data['message'], 'Like removed')
+        self.assertEqual(response.data['like_count'], 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.archived_like_count, 0)
+
+
+    def test_deleting_a_user_drops_their_archived_reactions_from_counts(self):
+        fan = User.objects.create_user(username='fan', password='pass')
+        self.post.likes.add(fan)
+        list(archive.archive_cold_data(older_than_days=365))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.archived_like_count, 2)
+
+        fan.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.archived_like_count, 1)
+        self.assertEqual(self.post.total_likes(), 1)
+
+class FeedTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='pass')
+        self.author = User.objects.create_user(username='author', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.category = Category.objects.create(name='Followed')
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, title, author, category=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title=title, content='Body', author=author,
+                                       category=category, status='published')
+        feed.process_pending()
+        return post
+
+    def test_feed_contains_followed_authors_and_categories(self):
+        response = self.client.post(reverse('author-follow', kwargs={'username': 'author'}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('category-follow', kwargs={'slug': self.category.slug}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        by_author = self.publish('By author', self.author)
+        in_category = self.publish('In category', self.other, self.category)
+        self.publish('Unrelated', self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Draft', content='Body', author=self.author)
+
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in response.data['results']], [in_category.pk, by_author.pk])
+
+    def test_redated_post_moves_in_the_feed(self):
+        AuthorFollow.objects.create(follower=self.reader, author=self.author)
+        older = self.publish('Older', self.author)
+        newer = self.publish('Newer', self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            older.published_at = newer.published_at + datetime.timedelta(hours=1)
+            older.save()
+
+        response = self.client.get(reverse('feed'))
+        self.assertEqual([p['id'] for p in response.data['results']], [older.pk, newer.pk])
+        self.assertEqual(FeedEntry.objects.get(post=older).published_at, older.published_at)
+
+    def test_feed_keyset_pagination_and_popular_merge(self):
+        AuthorFollow.objects.create(follower=self.reader, author=self.author)
+        with self.settings(BLOG_FEED_FANOUT_MAX_FOLLOWERS=1):
+            posts = [self.publish(f'Post {i}', self.author) for i in range(2)]
+            AuthorFollow.objects.create(follower=self.other, author=self.author)
+            posts += [self.publish(f'Post {i}', self.author) for i in range(2, 5)]
+
+        # The first posts were fanned out, later ones are merged at read time
+        self.assertTrue(PopularAuthor.objects.filter(author=self.author).exists())
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 2)
+
+        seen = []
+        response = self.client.get(reverse('feed'), {'limit': 2})
+        while True:
+            seen += [p['id'] for p in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(reverse('feed'), {'limit': 2, 'cursor': response.data['next']})
+        self.assertEqual(seen, [p.pk for p in reversed(posts)])
+
+    def test_fan_out_is_queued_off_the_request(self):
+        AuthorFollow.objects.create(follower=self.reader, author=self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='Queued', content='Body', author=self.author, status='published')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(feed.process_pending(), 1)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(feed.process_pending(), 0)
+
+    def test_popular_category_is_merged_on_read(self):
+        CategoryFollow.objects.create(follower=self.reader, category=self.category)
+        with self.settings(BLOG_FEED_FANOUT_MAX_FOLLOWERS=0):
+            post = self.publish('Crowded', self.other, self.category)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.client.get(reverse('feed'))
+        self.assertEqual([p['id'] for p in response.data['results']], [post.pk])
+
+    def test_moved_post_reaches_new_category_followers(self):
+        CategoryFollow.objects.create(follower=self.reader, category=self.category)
+        post = self.publish('Moving', self.other)
+        post.category = self.category
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        feed.process_pending()
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+
+    def test_unpublish_retracts_from_feed(self):
+        AuthorFollow.objects.create(follower=self.reader, author=self.author)
+        post = self.publish('Soon a draft', self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+
+        post.status = 'draft'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader, post=post).exists())
+
+
+@override_settings(BLOG_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='syncer', password='pass')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('post-list')
+
+    def sync(self, cursor):
+        response = self.client.get(self.url, {'updated_since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_and_tombstones_since_cursor(self):
+        kept = Post.objects.create(title='Kept', content='Body', author=self.user, status='published')
+        unpublished = Post.objects.create(title='Unpublished', content='Body', author=self.user, status='published')
+        deleted = Post.objects.create(title='Deleted', content='Body', author=self.user, status='published')
+        Post.objects.create(title='Draft', content='Body', author=self.user)
+
+        first = self.sync(0)
+        self.assertEqual([p['id'] for p in first['changes']], [kept.pk, unpublished.pk, deleted.pk])
+        self.assertFalse(first['has_more'])
+
+        unpublished.status = 'draft'
+        unpublished.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+        self.client.post(reverse('post-toggle-like', kwargs={'slug': kept.slug}))
+
+        second = self.sync(first['cursor'])
+        self.assertEqual([p['id'] for p in second['changes']], [kept.pk])
+        self.assertEqual(second['changes'][0]['like_count'], 1)
+        self.assertEqual([(t['id'], t['reason']) for t in second['deleted']],
+                         [(unpublished.pk, 'unpublished'), (deleted_id, 'deleted')])
+
+        self.assertEqual(self.sync(second['cursor'])['changes'], [])
+
+    def test_sync_pages_by_cursor(self):
+        posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user, status='published')
+                 for i in range(5)]
+        seen, cursor = [], 0
+        with self.settings(BLOG_SYNC_PAGE_SIZE=2):
+            while True:
+                data = self.sync(cursor)
+                seen += [p['id'] for p in data['changes']]
+                cursor = data['cursor']
+                if not data['has_more']:
+                    break
+        self.assertEqual(seen, [p.pk for p in posts])
+
+    def test_cursor_stops_at_committed_watermark(self):
+        first = Post.objects.create(title='Committed first', content='Body', author=self.user, status='published')
+        in_flight = ChangeSequence.next()
+        second = Post.objects.create(title='Committed next', content='Body', author=self.user, status='published')
+        # The in-flight writer's row is not visible yet; everything numbered after it is too young to hand out
+        ChangeSequence.objects.filter(pk=in_flight).delete()
+        ChangeSequence.objects.filter(pk__lt=in_flight).update(allocated_at=timezone.now() - datetime.timedelta(minutes=1))
+
+        with self.settings(BLOG_SYNC_SETTLE_SECONDS=30):
+            data = self.sync(0)
+        self.assertEqual([p['id'] for p in data['changes']], [first.pk])
+
+        late = Post.objects.create(title='Committed late', content='Body', author=self.user, status='published')
+        Post.objects.filter(pk=late.pk).update(change_seq=in_flight)
+        self.assertEqual([p['id'] for p in self.sync(data['cursor'])['changes']], [late.pk, second.pk])
+
+    def test_save_without_synced_changes_keeps_change_seq(self):
+        post = Post.objects.create(title='Steady', content='Body', author=self.user, status='published')
+        seq = post.change_seq
+        reloaded = Post.objects.get(pk=post.pk)
+        with self.assertNumQueries(1):
+            reloaded.save()
+        post.save(update_fields=['updated_at'])
+        self.assertEqual(Post.objects.get(pk=post.pk).change_seq, seq)
+
+        post.title = 'Moved on'
+        post.save(update_fields=['title'])
+        self.assertGreater(Post.objects.get(pk=post.pk).change_seq, seq)
+
+    def test_bump_change_seq_allocates_in_one_batch(self):
+        posts = [Post.objects.create(title=f'Bumped {i}', content='Body', author=self.user, status='published')
+                 for i in range(3)]
+        with mock.patch.object(ChangeSequence, 'PRUNE_EVERY', 10 ** 9), self.assertNumQueries(2):
+            Post.bump_change_seq([post.pk for post in posts])
+        seqs = [Post.objects.get(pk=post.pk).change_seq for post in posts]
+        self.assertEqual(len(set(seqs)), 3)
+        self.assertGreater(min(seqs), max(post.change_seq for post in posts))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'updated_since': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_draft_leaves_no_tombstone(self):
+        draft = Post.objects.create(title='Secret plans', content='Body', author=self.user)
+        draft.delete()
+        self.assertEqual(self.sync(0)['deleted'], [])
+
+    def test_sync_honours_category_filter(self):
+        category = Category.objects.create(name='Synced')
+        inside = Post.objects.create(title='Inside', content='Body', author=self.user, status='published',
+                                     category=category)
+        Post.objects.create(title='Outside', content='Body', author=self.user, status='published')
+        response = self.client.get(self.url, {'updated_since': 0, 'category': category.slug})
+        self.assertEqual([p['id'] for p in response.data['changes']], [inside.pk])
+
+    def test_backfill_numbers_existing_posts(self):
+        backfill = import_module('blog.migrations.0013_backfill_change_seq')
+        posts = [Post.objects.create(title=f'Old {i}', content='Body', author=self.user, status='published')
+                 for i in range(3)]
+        Post.objects.update(change_seq=0)
+        backfill.number_existing_posts(django_apps, None)
+        import_module('blog.migrations.0015_change_sequence_allocated_at').settle_existing_numbers(django_apps, None)
+
+        seqs = [Post.objects.get(pk=post.pk).change_seq for post in posts]
+        self.assertEqual(seqs, sorted(set(seqs)))
+        self.assertGreater(seqs[0], 0)
+        self.assertGreater(ChangeSequence.next(), seqs[-1])
+        self.assertEqual(len(self.sync(0)['changes']), 3)
+
+
+class PostEventsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='eventuser', password='testpass123')
+        self.post = Post.objects.create(title='Live', content='Body', author=self.user, status='published')
+
+    def test_updates_are_coalesced(self):
+        async def burst():
+            subscription = events.broker.subscribe(self.post.pk)
+            try:
+                def publish():
+                    for i in range(1000):
+                        events.broker.publish(self.post.pk, events.COUNTS, {'like_count': i})
+                    events.broker.publish(self.post.pk, events.COMMENTS, {'id': 1})
+                    events.broker.publish(self.post.pk, events.COMMENTS, {'id': 2})
+                thread = threading.Thread(target=publish)
+                thread.start()
+                thread.join()
+                await asyncio.wait_for(subscription.ready.wait(), 1)
+                return subscription.drain()
+            finally:
+                events.broker.unsubscribe(self.post.pk, subscription)
+
+        self.assertEqual(asyncio.run(burst()), [
+            (events.COUNTS, {'like_count': 999}),
+            (events.COMMENTS, [{'id': 1}, {'id': 2}]),
+        ])
+        self.assertFalse(events.broker.has_subscribers(self.post.pk))
+
+    async def test_stream_sends_snapshot_then_updates(self):
+        url = reverse('post-events', kwargs={'slug': self.post.slug})
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(frames), b'retry: 3000\n\n')
+            self.assertEqual(await anext(frames),
+                             b'event: counts\ndata: {"like_count":0,"dislike_count":0,"comment_count":0}\n\n')
+            events.broker.publish(self.post.pk, events.COUNTS, {'like_count': 1})
+            self.assertEqual(await anext(frames), b'event: counts\ndata: {"like_count":1}\n\n')
+        finally:
+            await frames.aclose()
+
+    def test_requires_asgi(self):
+        response = self.client.get(reverse('post-events', kwargs={'slug': self.post.slug}))
+        self.assertEqual(response.status_code, 501)
+
+
+class SyndicationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='feeduser', password='testpass123')
+        self.python = Category.objects.create(name='Python')
+        self.django = Category.objects.create(name='Django')
+        self.post = Post.objects.create(title='Generators', content='Yield all the things', author=self.user,
+                                        category=self.python, status='published')
+        Post.objects.create(title='Secret draft', content='Body', author=self.user, category=self.python)
+
+    def test_sitemaps_and_feeds(self):
+        index = self.client.get(reverse('sitemap'))
+        self.assertEqual(index.status_code, 200)
+        self.assertIn(b'/sitemaps/categories/python.xml', index.content)
+
+        sitemap = self.client.get(reverse('sitemap-category', kwargs={'slug': 'python'}))
+        self.assertIn(b'<loc>http://localhost:8000/posts/generators/</loc>', sitemap.content)
+        self.assertNotIn(b'secret-draft', sitemap.content)
+
+        rss = self.client.get(reverse('feed-category-rss', kwargs={'slug': 'python'}))
+        self.assertEqual(rss['Content-Type'], 'application/rss+xml; charset=utf-8')
+        self.assertIn(b'<title>Generators</title>', rss.content)
+        atom = self.client.get(reverse('feed-atom'))
+        self.assertIn(b'<title>Generators</title>', atom.content)
+        empty = self.client.get(reverse('feed-category-atom', kwargs={'slug': 'django'}))
+        self.assertNotIn(b'Generators', empty.content)
+
+    def test_conditional_get(self):
+        url = reverse('feed-rss')
+        first = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_last_modified_comes_from_the_content(self):
+        url = reverse('feed-rss')
+        first = self.client.get(url)['Last-Modified']
+        newest = Post.objects.order_by('-updated_at').values_list('updated_at', flat=True)[0]
+        self.assertEqual(first, http_date(newest.timestamp()))
+        # A rebuild, or another worker's copy, reports the same date for the same posts
+        cache.clear()
+        with mock.patch('time.time', return_value=newest.timestamp() + 3600):
+            self.assertEqual(self.client.get(url)['Last-Modified'], first)
+
+    def test_artifacts_expire_for_workers_that_missed_the_invalidation(self):
+        with self.settings(BLOG_SYNDICATION_TTL=42), mock.patch.object(syndication.cache, 'set') as cache_set:
+            syndication.get_artifact(syndication.RSS, syndication.ALL)
+        self.assertEqual(cache_set.call_args.args[2], 42)
+
+    def test_only_affected_segments_are_rebuilt(self):
+        for slug in ('python', 'django'):
+            self.client.get(reverse('feed-category-rss', kwargs={'slug': slug}))
+        self.client.get(reverse('feed-rss'))
+        django_key = syndication.cache_key(syndication.RSS, syndication.segment_for(self.django.pk))
+        python_key = syndication.cache_key(syndication.RSS, syndication.segment_for(self.python.pk))
+        all_key = syndication.cache_key(syndication.RSS, syndication.ALL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Generators, revisited'
+            self.post.save()
+        self.assertIsNone(cache.get(python_key))
+        self.assertIsNone(cache.get(all_key))
+        self.assertIsNotNone(cache.get(django_key))
+
+        rss = self.client.get(reverse('feed-category-rss', kwargs={'slug': 'python'}))
+        self.assertIn(b'Generators, revisited', rss.content)
+
+        # Moving the post invalidates both its old and its new category
+        self.client.get(reverse('feed-category-rss', kwargs={'slug': 'django'}))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.category = self.django
+            self.post.save()
+        self.assertIsNone(cache.get(python_key))
+        self.assertIsNone(cache.get(django_key))
+
+
+class AutocompleteTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.invalidate()
+        self.user = User.objects.create_user(username='searchuser', password='testpass123')
+        Category.objects.create(name='Programación')
+        self.old = Post.objects.create(title='Programar en Python', content='Body', author=self.user, status='published',
+                                       published_at=timezone.now() - datetime.timedelta(days=1))
+        self.new = Post.objects.create(title='Python avanzado', content='Body', author=self.user, status='published')
+        Post.objects.create(title='Python draft', content='Body', author=self.user)
+        self.url = reverse('autocomplete')
+
+    def labels(self, q, **params):
+        return [r['label'] for r in self.client.get(self.url, {'q': q, **params}).data['results']]
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.labels('pyt'), ['Python avanzado', 'Programar en Python'])
+        self.assertEqual(self.labels('progr'), ['Programación', 'Programar en Python'])
+        self.assertEqual(self.labels('python av'), ['Python avanzado'])
+        self.assertEqual(self.labels('pyt', limit=1), ['Python avanzado'])
+        self.assertEqual(self.labels(''), [])
+
+    def test_refreshes_on_rename_and_unpublish(self):
+        self.assertEqual(self.labels('rust'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new.title = 'Rust avanzado'
+            self.new.save()
+        self.assertEqual(self.labels('rust'), ['Rust avanzado'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old.status = 'draft'
+            self.old.save()
+        self.assertEqual(self.labels('python'), [])
+
+
+class StaffProfilingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='regular', password='testpass123')
+        Post.objects.create(title='Profiled', content='Body', author=self.user, status='published')
+
+    def get_posts(self, user, **extra):
+        token = Token.objects.create(user=user)
+        with self.settings(BLOG_PROFILE_DIR=self.directory.name):
+            return self.client.get(reverse('post-list'), HTTP_AUTHORIZATION=f'Token {token.key}', **extra)
+
+    def test_staff_request_is_profiled(self):
+        response = self.get_posts(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response['X-Profile-Id']
+        self.assertIn('sql=', response['X-Profile-Summary'])
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, f'{profile_id}.prof')))
+        with open(os.path.join(self.directory.name, f'{profile_id}.json')) as fh:
+            report = json.load(fh)
+        self.assertEqual(report['path'], reverse('post-list'))
+        self.assertTrue(any('blog_post' in query['sql'] for query in report['sql']))
+        self.assertTrue(any('views.py' in frame for query in report['sql'] for frame in query['origin']))
+
+    def test_other_requests_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.get_posts(self.user, HTTP_X_PROFILE='1'))
+        self.assertNotIn('X-Profile-Id', self.get_posts(self.staff))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_old_profiles_are_pruned(self):
+        with self.settings(BLOG_PROFILE_KEEP=1):
+            first = self.get_posts(self.staff, HTTP_X_PROFILE='1')['X-Profile-Id']
+            Token.objects.all().delete()
+            second = self.get_posts(self.staff, HTTP_X_PROFILE='1')['X-Profile-Id']
+        self.assertEqual(sorted(os.listdir(self.directory.name)), [f'{second}.json', f'{second}.prof'])
+        self.assertNotEqual(first, second)
+
+    async def test_profiles_under_asgi(self):
+        token = await Token.objects.acreate(user=self.staff)
+        with self.settings(BLOG_PROFILE_DIR=self.directory.name):
+            response = await self.async_client.get(
+                reverse('post-list'), headers={'Authorization': f'Token {token.key}', 'X-Profile': '1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with open(os.path.join(self.directory.name, f"{response['X-Profile-Id']}.json")) as fh:
+            self.assertTrue(any('blog_post' in query['sql'] for query in json.load(fh)['sql']))
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = self.settings(BLOG_METRICS_DIR=directory.name, BLOG_METRICS_TOKEN='scrape-me')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = directory.name
+        metrics.registry.reset()
+        self.staff = User.objects.create_user(username='ops', password='testpass123', is_staff=True)
+
+    def scrape(self, **extra):
+        return self.client.get(reverse('metrics'), **extra)
+
+    def test_requests_db_and_cache_metrics(self):
+        self.client.get(reverse('post-list'))
+        self.client.get(reverse('post-list'))
+        self.client.get(reverse('autocomplete'), {'q': 'py'})  # reads the index version from the cache
+        self.client.force_authenticate(self.staff)
+        body = self.scrape().content.decode()
+
+        self.assertIn('blog_http_requests_total{view="post-list",method="GET",status="200"} 2', body)
+        self.assertIn('blog_http_request_duration_seconds_count{view="post-list",method="GET"} 2', body)
+        self.assertIn('blog_http_request_duration_seconds_bucket{view="post-list",method="GET",le="+Inf"} 2', body)
+        self.assertRegex(body, r'blog_db_queries_total\{view="post-list"\} [1-9]')
+        self.assertRegex(body, r'blog_http_response_bytes_total\{view="post-list"\} [1-9]')
+        self.assertRegex(body, r'blog_cache_requests_total\{cache="backend",result="(hit|miss)"\} [1-9]')
+
+    async def test_requests_are_measured_under_asgi(self):
+        response = await self.async_client.get(reverse('post-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        snapshot = metrics.registry.snapshot()
+        self.assertEqual(snapshot['requests'], {'post-list\tGET\t200': 1})
+        self.assertGreater(snapshot['db_queries']['post-list'], 0)
+
+    def write_worker(self, pid, started, requests):
+        with open(os.path.join(self.directory, f'{pid}-{started}.json'), 'w') as fh:
+            json.dump({'requests': {'post-list\tGET\t200': requests}}, fh)
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        self.client.get(reverse('post-list'))
+        self.write_worker(os.getppid(), 1, 5)
+        body = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('blog_http_requests_total{view="post-list",method="GET",status="200"} 6', body)
+        self.assertIn('blog_metrics_processes 2', body)
+
+    def test_exited_workers_are_retired(self):
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        self.write_worker(exited.pid, 1, 5)
+        # Same pid as a live worker, but started earlier: an exited worker whose pid was reused
+        self.write_worker(os.getppid(), 1, 2)
+        self.write_worker(os.getppid(), 2, 1)
+
+        for _ in range(2):
+            totals = metrics.aggregate()
+            self.assertEqual(totals['requests']['post-list\tGET\t200'], 8)
+            self.assertEqual(totals['processes'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'{exited.pid}-1.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, f'{os.getppid()}-1.json')))
+
+    def test_get_many_and_get_or_set_are_counted(self):
+        cache.set('present', 1)
+        cache.get_many(['present', 'absent'])
+        cache.get_or_set('created', 2)
+        self.assertEqual(metrics.registry.snapshot()['cache'],
+                         {'backend\thit': 1, 'backend\tmiss': 2})
+
+    def test_requires_staff_or_token(self):
+        self.assertIn(self.scrape().status_code, (401, 403))
+        self.assertIn(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, (401, 403))
+
+
+class SnapshotTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = self.settings(BLOG_SNAPSHOT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='snapuser', password='testpass123')
+        self.category = Category.objects.create(name='Front')
+        Post.objects.create(title='Front page', content='Body', author=self.user,
+                            category=self.category, status='published')
+
+    def fetch(self, url, **extra):
+        response = self.client.get(url, **extra)
+        return response, b''.join(response.streaming_content)
+
+    def test_snapshots_match_the_api_and_are_immutable(self):
+        manifest = snapshots.publish()
+        _, body = self.fetch(settings.BLOG_SNAPSHOT_URL + snapshots.MANIFEST)
+        self.assertEqual(json.loads(body)['files'], manifest['files'])
+
+        response, body = self.fetch(manifest['files']['posts'])
+        self.assertEqual(body, self.client.get(reverse('post-list'), {'status': 'published', 'lite': 'true'}).content)
+        self.assertIn('immutable', response['Cache-Control'])
+        _, body = self.fetch(manifest['files']['categories'])
+        self.assertEqual(body, self.client.get(reverse('category-list')).content)
+
+        response, body = self.fetch(manifest['files']['posts'], HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.client.get(settings.BLOG_SNAPSHOT_URL + '../settings.py').status_code, 404)
+
+    def test_pruned_snapshot_is_not_found(self):
+        url = snapshots.publish()['files']['posts']
+        self.fetch(url)
+        filename = url[len(settings.BLOG_SNAPSHOT_URL):]
+        for name in os.listdir(settings.BLOG_SNAPSHOT_DIR):
+            if name.startswith(filename):
+                os.remove(os.path.join(settings.BLOG_SNAPSHOT_DIR, name))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_republish_picks_up_changes_and_keeps_an_unchanged_manifest(self):
+        before = snapshots.publish()
+        self.assertEqual(snapshots.publish(), before)
+
+        Post.objects.create(title='Breaking', content='Body', author=self.user, status='published')
+        with self.settings(BLOG_SNAPSHOT_POSTS=1):
+            call_command('publish_snapshots', stdout=StringIO())
+        _, body = self.fetch(settings.BLOG_SNAPSHOT_URL + snapshots.MANIFEST)
+        after = json.loads(body)
+        self.assertNotEqual(after['files']['posts'], before['files']['posts'])
+        self.assertEqual(after['files']['categories'], before['files']['categories'])
+        _, posts = self.fetch(after['files']['posts'])
+        self.assertEqual([p['title'] for p in json.loads(posts)], ['Breaking'])
+
+
+class MonthlyArchiveTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='archiver', password='testpass123')
+        self.category = Category.objects.create(name='History')
+        self.march = [
+            Post.objects.create(title=f'March {day}', content='Body', author=self.user, status='published',
+                                category=self.category if day % 2 else None,
+                                published_at=datetime.datetime(2025, 3, day, tzinfo=datetime.timezone.utc))
+            for day in (1, 2, 3)
+        ]
+        self.april = Post.objects.create(title='April', content='Body', author=self.user, status='published',
+                                         published_at=datetime.datetime(2025, 4, 10, tzinfo=datetime.timezone.utc))
+        Post.objects.create(title='Draft', content='Body', author=self.user)
+
+    def months(self, **params):
+        return [(m['year'], m['month'], m['count']) for m in self.client.get(reverse('archive-months'), params).data]
+
+    def test_counts_follow_post_changes(self):
+        self.assertEqual(self.months(), [(2025, 4, 1), (2025, 3, 3)])
+        self.assertEqual(self.months(category='history'), [(2025, 3, 2)])
+
+        self.april.status = 'draft'
+        self.april.save()
+        moved = self.march[1]
+        moved.category = self.category
+        moved.save()
+        self.march[0].delete()
+        self.assertEqual(self.months(), [(2025, 3, 2)])
+        self.assertEqual(self.months(category='history'), [(2025, 3, 2)])
+
+        maintained = set(MonthlyPostCount.objects.filter(count__gt=0).values_list('year', 'month', 'category_id', 'count'))
+        monthly.rebuild()
+        self.assertEqual(set(MonthlyPostCount.objects.values_list('year', 'month', 'category_id', 'count')), maintained)
+
+    def test_unpublishing_an_uncounted_post_stays_at_zero(self):
+        MonthlyPostCount.objects.update(count=0)
+        fill = import_module('blog.migrations.0014_fill_monthly_counts')
+        self.april.status = 'draft'
+        self.april.save()
+        self.assertEqual(MonthlyPostCount.objects.get(year=2025, month=4).count, 0)
+
+        fill.fill_monthly_counts(django_apps, None)
+        self.assertEqual(self.months(), [(2025, 3, 3)])
+
+    def test_deleting_a_category_keeps_its_posts_counted(self):
+        self.category.delete()
+        self.assertEqual(self.months(), [(2025, 4, 1), (2025, 3, 3)])
+
+    def test_month_posts_keyset_pagination(self):
+        url = reverse('archive-month-posts', kwargs={'year': 2025, 'month': 3})
+        first = self.client.get(url, {'limit': 2}).data
+        self.assertEqual([p['title'] for p in first['results']], ['March 3', 'March 2'])
+        second = self.client.get(url, {'limit': 2, 'cursor': first['next']}).data
+        self.assertEqual([p['title'] for p in second['results']], ['March 1'])
+        self.assertIsNone(second['next'])
+
+    def test_month_out_of_range_is_not_found(self):
+        for year, month in ((0, 1), (9999, 12), (2024, 13), (2024, 0)):
+            url = reverse('archive-month-posts', kwargs={'year': year, 'month': month})
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RelatedPostsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='testpass123')
+        self.readers = [User.objects.create_user(username=f'reader{i}', password='testpass123') for i in range(3)]
+        self.python = Category.objects.create(name='Python')
+        self.other = Category.objects.create(name='Other')
+
+        def post(title, category):
+            return Post.objects.create(title=title, content='Body', author=self.author,
+                                       category=category, status='published')
+        self.base = post('Base', self.python)
+        self.colike = post('Co-liked', self.other)
+        self.sibling = post('Sibling', self.python)
+        self.unrelated = post('Unrelated', self.other)
+        for reader in self.readers:
+            self.base.likes.add(reader)
+            self.colike.likes.add(reader)
+        # One shared liker out of three each: weaker than sharing the category
+        self.unrelated.likes.add(self.readers[0], *[User.objects.create_user(username=f'fan{i}') for i in range(2)])
+
+    def related_titles(self, post):
+        url = reverse('post-detail', kwargs={'slug': post.slug})
+        return [p['title'] for p in self.client.get(url).data['related_posts']]
+
+    def test_like_count_dropping_to_zero_mid_build(self):
+        counts = related._post_info
+
+        def unliked_meanwhile(post_ids):
+            return {post_id: (0, category_id) for post_id, (_, category_id) in counts(post_ids).items()}
+
+        with mock.patch.object(related, '_post_info', unliked_meanwhile):
+            scores = dict(related.score_batch([self.base.pk], top_k=5)[self.base.pk])
+        self.assertEqual(scores, {self.sibling.pk: related.CATEGORY_WEIGHT})
+
+    def test_blends_co_likes_and_category(self):
+        related.build(top_k=2)
+        self.assertEqual(self.related_titles(self.base), ['Co-liked', 'Sibling'])
+        self.assertEqual(self.related_titles(self.sibling), ['Base'])
+        self.assertEqual(RelatedPost.objects.filter(post=self.base).count(), 2)
+
+    def test_incremental_only_redoes_changed_posts(self):
+        self.assertEqual(related.build(), 4)
+        self.assertEqual(related.build(incremental=True), 0)
+
+        self.client.force_authenticate(self.readers[1])
+        self.client.post(reverse('post-toggle-like', kwargs={'slug': self.unrelated.slug}))
+        self.client.post(reverse('post-toggle-like', kwargs={'slug': self.sibling.slug}))
+        self.client.force_authenticate(None)
+        # The two liked posts plus everything their likers liked
+        self.assertEqual(related.build(incremental=True), 4)
+        self.assertEqual(self.related_titles(self.sibling)[0], 'Base')
+
+    def test_incremental_refreshes_posts_sharing_likers(self):
+        related.build()
+        base_to_sibling = RelatedPost.objects.filter(post=self.base, related=self.sibling)
+        self.assertAlmostEqual(base_to_sibling.get().score, related.CATEGORY_WEIGHT)
+
+        self.client.force_authenticate(self.readers[1])
+        self.client.post(reverse('post-toggle-like', kwargs={'slug': self.sibling.slug}))
+        related.build(incremental=True)
+        # Base itself did not change, but it now shares a liker with Sibling
+        self.assertGreater(base_to_sibling.get().score, related.CATEGORY_WEIGHT)
+
+    def test_detail_fetches_related_posts_in_one_query(self):
+        related.build()
+        self.sibling.status = 'draft'
+        self.sibling.save()
+        serializer = PostDetailSerializer(self.base)
+        with self.assertNumQueries(1):
+            data = serializer.get_related_posts(self.base)
+        self.assertNotIn('Sibling', [p['title'] for p in data])
+
+
+class LoadTestCommandTestCase(LiveServerTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.fixture = os.path.join(directory.name, 'fixture.json')
+        self.output = os.path.join(directory.name, 'results.json')
+        user = User.objects.create_user(username='loader', password='testpass123')
+        post = Post.objects.create(title='Loaded', content='Body', author=user, status='published')
+        with open(self.fixture, 'w') as fh:
+            json.dump({'tokens': {}, 'post_slugs': [post.slug], 'search_terms': ['Loaded'],
+                       'hot_post_slug': post.slug, 'password': 'testpass123'}, fh)
+
+    def test_bad_mix_is_a_command_error(self):
+        for mix in ('list=fast', '__init__=1', 'list=-1', 'list=0'):
+            with self.assertRaises(CommandError):
+                call_command('loadtest', fixture=self.fixture, mix=mix)
+
+    def test_seed_blog_is_idempotent(self):
+        def seed():
+            call_command('seed_blog', users=4, categories=2, posts=6, comments=12,
+                         fixture=self.fixture, stdout=StringIO())
+            return (sorted(Post.objects.filter(slug__startswith='loadtest-post-').values_list('slug', 'title')),
+                    sorted(Post.likes.through.objects.values_list('post_id', 'user_id')),
+                    sorted(Comment.objects.values_list('post_id', 'name', 'content')))
+
+        self.assertEqual(seed(), seed())
+
+    def test_mostly_throttled_run_fails(self):
+        cache.clear()
+        with mock.patch.dict(SlidingWindowThrottle.THROTTLE_RATES, {'comments_ip': '1/min'}):
+            with self.assertRaisesMessage(CommandError, '429'):
+                call_command('loadtest', base_url=self.live_server_url, fixture=self.fixture,
+                             mix='comment=1', concurrency=1, duration=0.5, warmup=0, stdout=StringIO())
+
+    def test_replays_the_mix(self):
+        call_command('loadtest', base_url=self.live_server_url, fixture=self.fixture,
+                     mix='list=2,detail=1', concurrency=1, duration=0.5, warmup=0,
+                     output=self.output, stdout=StringIO())
+        with open(self.output) as fh:
+            endpoints = json.load(fh)['endpoints']
+        self.assertGreater(endpoints['total']['requests'], 0)
+        for name in ('list', 'detail'):
+            if name in endpoints:
+                self.assertEqual(set(endpoints[name]['statuses']), {'200'})
@@ -0,0 +1,184 @@
+"""
+Cache-backed throttles and load shedding.
+
+Throttles use a sliding-window counter: one atomic counter per fixed window
+in CACHES['default'], with the previous window weighted by how much of it
+still overlaps the sliding window. That is two small integers per client
+instead of DRF's per-request timestamp list. Limits are global only when
+that cache is shared (settings.BLOG_CACHE_URL); with the LocMemCache
+fallback every worker process counts on its own.
+"""
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+
+from .cacheutils import incr
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f'{self.key}:{window}'
+        # Count first and compare the result, so a concurrent burst cannot all pass one check
+        counted = incr(self.cache, current_key, self.duration * 2)
+
+        self.current = counted - 1
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+        if self.previous * (1 - self.elapsed) + counted > self.num_requests:
+            # Rejected requests do not use up the window
+            self.cache.decr(current_key)
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed)
+        if self.current >= self.num_requests or not self.previous:
+            return remaining
+        # Time until enough of the previous window has slid out
+        needed = 1 - (self.num_requests - self.current) / self.previous
+        return max(0, (needed - self.elapsed) * self.duration) or remaining
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """Throttles by client IP address."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Throttles by authenticated user; anonymous requests are left to the IP throttles."""
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class LoginIPThrottle(IPRateThrottle):
+    scope = 'login'
+
+
+class LoginUsernameThrottle(SlidingWindowThrottle):
+    """Limits attempts against a single account, whichever IPs they come from."""
+
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username')
+        if not username or not isinstance(username, str):
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': username.lower()[:150]}
+
+
+class RegisterIPThrottle(IPRateThrottle):
+    scope = 'register'
+
+
+class ReactionIPThrottle(IPRateThrottle):
+    scope = 'reactions_ip'
+
+
+class ReactionUserThrottle(UserRateThrottle):
+    scope = 'reactions'
+
+
+class CommentIPThrottle(IPRateThrottle):
+    scope = 'comments_ip'
+
+
+class CommentUserThrottle(UserRateThrottle):
+    scope = 'comments'
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please try again shortly.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait=1):
+        super().__init__()
+        # Picked up by DRF's exception handler as a Retry-After header
+        self.wait = wait
+
+
+class ConcurrencyLimiter:
+    """
+    Counts in-flight requests for a scope in CACHES['default'] (per worker
+    unless settings.BLOG_CACHE_URL points at a shared cache).
+
+    acquire() never blocks: when every slot is taken the caller sheds the
+    request instead of queueing it. The counter expires `timeout` seconds
+    after the last acquire so a crashed worker cannot leak slots forever;
+    a release after it expired never takes the count below zero.
+    """
+
+    def __init__(self, scope, limit, timeout=30, cache=default_cache):
+        self.key = f'concurrency:{scope}'
+        self.limit = limit
+        self.timeout = timeout
+        self.cache = cache
+
+    def acquire(self):
+        in_flight = incr(self.cache, self.key, self.timeout)
+        # Keep the key alive while requests keep coming in
+        self.cache.touch(self.key, self.timeout)
+        if in_flight > self.limit:
+            self.release()
+            return False
+        return True
+
+    def release(self):
+        try:
+            remaining = self.cache.decr(self.key)
+            if remaining < 0:
+                # The key expired and was recreated while this request ran
+                self.cache.incr(self.key, -remaining)
+        except ValueError:
+            pass
+
+
+class LoadSheddingMixin:
+    """
+    View mixin that caps concurrent executions of expensive endpoints.
+
+    The limit for `concurrency_scope` comes from settings.BLOG_CONCURRENCY_LIMITS.
+    Authentication, permissions and throttles run first so cheap rejections
+    never take a slot.
+    """
+
+    concurrency_scope = None
+
+    def get_concurrency_limiter(self):
+        limit = settings.BLOG_CONCURRENCY_LIMITS.get(self.concurrency_scope)
+        if not limit:
+            return None
+        return ConcurrencyLimiter(self.concurrency_scope, limit)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        limiter = self.get_concurrency_limiter()
+        if limiter is not None:
+            if not limiter.acquire():
+                raise ServiceOverloaded()
+            self._concurrency_limiter = limiter
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        limiter = getattr(self, '_concurrency_limiter', None)
+        if limiter is not None:
+            limiter.release()
+            self._concurrency_limiter = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -11,5 +11,19 @@ urlpatterns.append(path('register/', views.RegisterView.as_view(), name='registe
 urlpatterns.append(path('login/', views.LoginView.as_view(), name='login'))
 urlpatterns.append(path('logout/', views.LogoutView.as_view(), name='logout'))
 urlpatterns.append(path('delete-account/', views.DeleteAccountView.as_view(), name='delete-account'))
+urlpatterns.append(path('feed/', views.FeedView.as_view(), name='feed'))
+urlpatterns.append(path('posts/<slug:slug>/events/', views.post_events, name='post-events'))
+urlpatterns.append(path('authors/<str:username>/follow/', views.AuthorFollowView.as_view(), name='author-follow'))
+urlpatterns.append(path('archive/', views.MonthlyArchiveView.as_view(), name='archive-months'))
+urlpatterns.append(path('archive/<int:year>/<int:month>/', views.MonthlyArchivePostsView.as_view(), name='archive-month-posts'))
+urlpatterns.append(path('metrics/', views.MetricsView.as_view(), name='metrics'))
+urlpatterns.append(path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'))
+urlpatterns.append(path('sitemap.xml', views.sitemap_index, name='sitemap'))
+urlpatterns.append(path('sitemaps/categories/<slug:slug>.xml', views.category_sitemap, name='sitemap-category'))
+urlpatterns.append(path('sitemaps/uncategorized.xml', views.uncategorized_sitemap, name='sitemap-uncategorized'))
+for kind in ('rss', 'atom'):
+    urlpatterns.append(path(f'feeds/{kind}/', views.post_feed, {'kind': kind}, name=f'feed-{kind}'))
+    urlpatterns.append(path(f'feeds/categories/<slug:slug>/{kind}/', views.post_feed, {'kind': kind},
+                            name=f'feed-category-{kind}'))
 
 urlpatterns +=  router.urls
@@ -4,32 +4,51 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.views.decorators.http import require_safe
 
-from .models import Category, Post, Comment
+from .models import AuthorFollow, Category, CategoryFollow, ChangeSequence, Post, PostTombstone, Comment
 from .serializers import (CategorySerializer, PostListSerializer, 
                          PostDetailSerializer, PostCreateUpdateSerializer, CommentSerializer, UserSerializer)
 from rest_framework import generics
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from blog.permissions import IsAuthenticatedForLikeDislike
+from blog.permissions import IsAuthenticatedForLikeDislike, IsStaffOrMetricsToken
+from blog import archive, autocomplete, counters, events, fastpaths, feed, metrics, monthly, syndication
+from blog.pagination import decode_cursor, encode_cursor, keyset_filter
+from blog.throttling import (CommentIPThrottle, CommentUserThrottle, LoadSheddingMixin,
+                             LoginIPThrottle, LoginUsernameThrottle, ReactionIPThrottle,
+                             ReactionUserThrottle, RegisterIPThrottle)
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
 
 
-class RegisterView(generics.CreateAPIView):
+def is_lite(request):
+    return request.query_params.get('lite', '').lower() in ('1', 'true', 'yes')
+
+
+class RegisterView(LoadSheddingMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = UserSerializer
+    throttle_classes = [RegisterIPThrottle]
+    concurrency_scope = 'password_hashing'
 
     def perform_create(self, serializer):
         serializer.save()
 
 
-class LoginView(ObtainAuthToken):
+class LoginView(LoadSheddingMixin, ObtainAuthToken):
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
+    concurrency_scope = 'password_hashing'
+
     def post(self, request, *args, **kwargs):
         # Try to authenticate the user
         serializer = self.serializer_class(data=request.data,
@@ -77,6 +96,29 @@ class CategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
 
+    def list(self, request, *args, **kwargs):
+        if not settings.BLOG_FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        values = fastpaths.category_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(fastpaths.category_rows(page))
+        return Response(fastpaths.category_rows(values))
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[IsAuthenticated])
+    def follow(self, request, slug=None):
+        category = self.get_object()
+        if request.method == 'DELETE':
+            feed.unfollow_category(request.user, category)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        _, created = CategoryFollow.objects.get_or_create(follower=request.user, category=category)
+        if created:
+            feed.backfill(request.user, category.posts.all())
+        return Response({'status': 'success', 'following': category.slug},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
 class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostListSerializer
@@ -99,9 +141,95 @@ class PostViewSet(viewsets.ModelViewSet):
         
         if not self.request.user.is_staff:
             queryset = queryset.filter(status='published')
+
+        if self.action == 'list' and self.is_lite():
+            queryset = queryset.defer('content')
         
         return queryset
+
+    def is_lite(self):
+        return is_lite(self.request)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['lite'] = self.action in ['list', 'my_posts'] and self.is_lite()
+        return context
     
+    def list(self, request, *args, **kwargs):
+        updated_since = request.query_params.get('updated_since')
+        if updated_since is not None:
+            return self.changes(request, updated_since)
+
+        if not settings.BLOG_FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        lite = self.is_lite()
+        values = fastpaths.post_list_values(self.filter_queryset(self.get_queryset()), lite=lite)
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response(fastpaths.post_list_rows(page, request, lite=lite))
+        return Response(fastpaths.post_list_rows(values, request, lite=lite))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        counters.record_view(instance)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+    def changes(self, request, updated_since):
+        """
+        Delta sync: published posts changed after the cursor plus tombstones
+        for posts deleted or unpublished since, in change_seq order.
+
+        Clients start with ?updated_since=0 and keep passing back `cursor`
+        until `has_more` is false. Sequence numbers are taken before commit,
+        so pages stop at ChangeSequence.committed_watermark(): a number still
+        in flight is never skipped, it just shows up a few seconds later.
+        """
+        try:
+            cursor = int(updated_since)
+        except ValueError:
+            return Response({'updated_since': 'Must be a cursor returned by this endpoint.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = settings.BLOG_SYNC_PAGE_SIZE
+        watermark = ChangeSequence.committed_watermark()
+
+        # Same status/category filters as the plain list; sync only ever carries published posts
+        changed = list(
+            self.get_queryset().filter(status='published', change_seq__gt=cursor, change_seq__lte=watermark)
+            .order_by('change_seq').values_list('change_seq', 'id')[:limit]
+        )
+        tombstones = list(
+            PostTombstone.objects.filter(change_seq__gt=cursor, change_seq__lte=watermark)
+            .order_by('change_seq').values_list('change_seq', 'post_id', 'slug', 'reason')[:limit]
+        )
+        # Merge both streams and cut at `limit` so the cursor never skips anything
+        entries = sorted([(seq, 'post', post_id) for seq, post_id in changed]
+                         + [(row[0], 'tombstone', row) for row in tombstones])[:limit]
+        has_more = len(changed) == limit or len(tombstones) == limit
+        has_more = has_more or len(changed) + len(tombstones) > limit
+
+        post_ids = [item for _, kind, item in entries if kind == 'post']
+        lite = self.is_lite()
+        values = fastpaths.post_list_values(Post.objects.filter(pk__in=post_ids), lite=lite)
+        rows = {row['id']: row for row in fastpaths.post_list_rows(values, request, lite=lite)}
+
+        changes, deleted = [], []
+        for seq, kind, item in entries:
+            if kind == 'post':
+                if item in rows:
+                    changes.append({**rows[item], 'change_seq': seq})
+            else:
+                _, post_id, slug, reason = item
+                deleted.append({'id': post_id, 'slug': slug, 'reason': reason, 'change_seq': seq})
+
+        return Response({
+            'changes': changes,
+            'deleted': deleted,
+            'cursor': str(max(entries[-1][0], cursor) if entries else cursor),
+            'has_more': has_more,
+        })
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return PostDetailSerializer
@@ -123,7 +251,13 @@ class PostViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['get'])
+    def comments(self, request, slug=None):
+        post = self.get_object()
+        serializer = CommentSerializer(archive.approved_comments(post), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'], throttle_classes=[CommentIPThrottle, CommentUserThrottle])
     def add_comment(self, request, slug=None):
         post = self.get_object()
         serializer = CommentSerializer(data=request.data)
@@ -132,10 +266,11 @@ class PostViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[ReactionIPThrottle, ReactionUserThrottle])
     def toggle_dislike(self, request, slug=None):
         post = self.get_object()
         user = request.user
+        archive.restore_reactions(post, user)
         
         # Remove like if it exists
         if post.likes.filter(id=user.id).exists():
@@ -148,18 +283,23 @@ class PostViewSet(viewsets.ModelViewSet):
         else:
             post.dislikes.add(user)
             message = 'Dislike added'
+        # Counts changed, so sync clients need this post again
+        Post.bump_change_seq([post.pk])
+        like_count, dislike_count = post.total_likes(), post.total_dislikes()
+        events.publish_counts(post, like_count, dislike_count)
         
         return Response({
             'status': 'success',
             'message': message,
-            'like_count': post.likes.count(),
-            'dislike_count': post.dislikes.count()
+            'like_count': like_count,
+            'dislike_count': dislike_count
         })
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[ReactionIPThrottle, ReactionUserThrottle])
     def toggle_like(self, request, slug=None):
         post = self.get_object()
         user = request.user
+        archive.restore_reactions(post, user)
         
         # Remove dislike if it exists
         if post.dislikes.filter(id=user.id).exists():
@@ -172,12 +312,16 @@ class PostViewSet(viewsets.ModelViewSet):
         else:
             post.likes.add(user)
             message = 'Like added'
+        # Counts changed, so sync clients need this post again
+        Post.bump_change_seq([post.pk])
+        like_count, dislike_count = post.total_likes(), post.total_dislikes()
+        events.publish_counts(post, like_count, dislike_count)
         
         return Response({
             'status': 'success',
             'message': message,
-            'like_count': post.likes.count(),
-            'dislike_count': post.dislikes.count()
+            'like_count': like_count,
+            'dislike_count': dislike_count
         })
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
@@ -185,6 +329,12 @@ class PostViewSet(viewsets.ModelViewSet):
         print("Checking user posts /my-posts/")
         
         queryset = Post.objects.filter(author=request.user)
+        if settings.BLOG_FAST_LIST_SERIALIZATION:
+            values = fastpaths.post_list_values(queryset, lite=self.is_lite())
+            return Response(fastpaths.post_list_rows(values, request, lite=self.is_lite()))
+
+        if self.is_lite():
+            queryset = queryset.defer('content')
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
     
@@ -208,3 +358,156 @@ class DeleteAccountView(APIView):
             {"message": "Account successfully deleted"}, 
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+class AuthorFollowView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, username):
+        author = generics.get_object_or_404(User, username=username)
+        if author == request.user:
+            return Response({'detail': 'You cannot follow yourself.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        _, created = AuthorFollow.objects.get_or_create(follower=request.user, author=author)
+        if created:
+            feed.backfill(request.user, author.posts.all())
+        return Response({'status': 'success', 'following': author.username},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, username):
+        author = generics.get_object_or_404(User, username=username)
+        feed.unfollow_author(request.user, author)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FeedView(APIView):
+    """Home feed of followed authors and categories, keyset paginated via ?cursor=."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        cursor = request.query_params.get('cursor')
+        page, next_cursor = feed.read_feed(request.user, decode_cursor(cursor) if cursor else None, limit)
+
+        post_ids = [post_id for _, post_id in page]
+        lite = is_lite(request)
+        values = fastpaths.post_list_values(Post.objects.filter(pk__in=post_ids), lite=lite)
+        rows = {row['id']: row for row in fastpaths.post_list_rows(values, request, lite=lite)}
+        return Response({
+            'results': [rows[post_id] for post_id in post_ids if post_id in rows],
+            'next': next_cursor,
+        })
+
+
+class MonthlyArchiveView(APIView):
+    """Published post counts per month, optionally for one ?category=<slug>."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        category_id = None
+        category = request.query_params.get('category')
+        if category:
+            category_id = generics.get_object_or_404(Category, slug=category).pk
+        return Response(monthly.months(category_id))
+
+
+class MonthlyArchivePostsView(APIView):
+    """Published posts of one month, newest first, keyset paginated via ?cursor=."""
+    permission_classes = [AllowAny]
+
+    def get(self, request, year, month):
+        # month_range() needs the following month to exist as a datetime too
+        if not (1 <= year <= 9998 and 1 <= month <= 12):
+            raise Http404
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start, end = monthly.month_range(year, month)
+        posts = Post.objects.filter(status='published', published_at__gte=start, published_at__lt=end)
+        category = request.query_params.get('category')
+        if category:
+            posts = posts.filter(category__slug=category)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            posts = posts.filter(keyset_filter('published_at', 'id', decode_cursor(cursor)))
+
+        lite = is_lite(request)
+        values = list(fastpaths.post_list_values(posts.order_by('-published_at', '-id'), lite=lite)[:limit])
+        next_cursor = None
+        if len(values) == limit:
+            next_cursor = encode_cursor(values[-1]['published_at'], values[-1]['id'])
+        return Response({
+            'results': fastpaths.post_list_rows(values, request, lite=lite),
+            'next': next_cursor,
+        })
+
+
+class AutocompleteView(APIView):
+    """Top matching post titles and category names for the search box (?q=&limit=)."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'limit': 'Must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        query = request.query_params.get('q', '')
+        return Response({'results': autocomplete.suggest(query, max(limit, 1))})
+
+
+class MetricsView(APIView):
+    """Prometheus scrape endpoint summing the metrics of every worker process."""
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    permission_classes = [IsStaffOrMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(metrics.render_prometheus(metrics.aggregate()),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def post_events(request, slug):
+    """
+    Server-Sent Events stream of like/dislike/comment counts and newly
+    approved comments for one published post. Needs the ASGI server.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI an endless stream would pin a worker thread per client
+        return HttpResponse('Live updates are only served through core.asgi.',
+                            status=501, content_type='text/plain')
+    post = await Post.objects.filter(slug=slug, status='published').afirst()
+    if post is None:
+        raise Http404
+    response = StreamingHttpResponse(events.stream(post), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_safe
+def sitemap_index(request):
+    return syndication.serve(request, syndication.SITEMAP_INDEX)
+
+
+@require_safe
+def category_sitemap(request, slug):
+    category = get_object_or_404(Category, slug=slug)
+    return syndication.serve(request, syndication.SITEMAP, syndication.segment_for(category.pk))
+
+
+@require_safe
+def uncategorized_sitemap(request):
+    return syndication.serve(request, syndication.SITEMAP, syndication.UNCATEGORIZED)
+
+
+@require_safe
+def post_feed(request, kind, slug=None):
+    segment = syndication.ALL
+    if slug is not None:
+        segment = syndication.segment_for(get_object_or_404(Category, slug=slug).pk)
+    return syndication.serve(request, kind, segment)
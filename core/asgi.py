@@ -3,6 +3,12 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this module to enable the live post updates at
+/api/posts/<slug>/events/ (blog.events). The event broker is in-process,
+so run one worker per instance, e.g.
+
+    uvicorn core.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
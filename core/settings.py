@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from dotenv import load_dotenv
 import sys
@@ -55,13 +56,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise plus the JSON snapshots written by blog/snapshots.py
+    'blog.middleware.SnapshotWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog.middleware.StaffProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -170,11 +174,109 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Require login
     ],
+    # orjson-backed when available, same bytes as DRF's JSONRenderer otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'blog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Sliding-window rates used by blog.throttling (counters live in CACHES['default'], see BLOG_CACHE_URL)
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN', '20/min'),
+        'login_username': os.getenv('THROTTLE_LOGIN_USERNAME', '10/min'),
+        'register': os.getenv('THROTTLE_REGISTER', '10/hour'),
+        'reactions': os.getenv('THROTTLE_REACTIONS', '60/min'),
+        'reactions_ip': os.getenv('THROTTLE_REACTIONS_IP', '300/min'),
+        'comments': os.getenv('THROTTLE_COMMENTS', '10/min'),
+        'comments_ip': os.getenv('THROTTLE_COMMENTS_IP', '20/min'),
+    },
+}
+
+# Max in-flight requests per scope, extra requests get a 503. Global with BLOG_CACHE_URL,
+# per worker process with the LocMemCache fallback
+BLOG_CONCURRENCY_LIMITS = {
+    'password_hashing': int(os.getenv('CONCURRENCY_PASSWORD_HASHING', '8')),
 }
 
+# MessagePack is negotiated through the Accept/Content-Type headers when installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('blog.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('blog.parsers.MessagePackParser')
+
+# Serve the post/category list endpoints from values() rows instead of DRF serializers
+BLOG_FAST_LIST_SERIALIZATION = os.getenv('BLOG_FAST_LIST_SERIALIZATION', 'True') == 'True'
+
+# Seconds between flushes of cached post view counters to Post.views
+BLOG_VIEW_FLUSH_INTERVAL = int(os.getenv('BLOG_VIEW_FLUSH_INTERVAL', '30'))
+# Flush them once more when a worker exits (only needed without a shared cache)
+BLOG_VIEW_FLUSH_AT_EXIT = True
+
+# Comments and reactions of posts older than this are moved to the archive tables
+BLOG_ARCHIVE_AFTER_DAYS = int(os.getenv('BLOG_ARCHIVE_AFTER_DAYS', '365'))
+
+# Authors and categories with more followers than this are merged into feeds at read time
+BLOG_FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('BLOG_FEED_FANOUT_MAX_FOLLOWERS', '10000'))
+# Recent posts copied into a timeline when a user follows an author or category
+BLOG_FEED_BACKFILL = int(os.getenv('BLOG_FEED_BACKFILL', '20'))
+
+# Max changes + tombstones per page of /api/posts/?updated_since=
+BLOG_SYNC_PAGE_SIZE = int(os.getenv('BLOG_SYNC_PAGE_SIZE', '200'))
+# Sync only returns changes numbered more than this long ago; must exceed the slowest write transaction
+BLOG_SYNC_SETTLE_SECONDS = float(os.getenv('BLOG_SYNC_SETTLE_SECONDS', '5'))
+
+# Where StaffProfilingMiddleware writes the profiles requested with X-Profile / ?__profile=1
+BLOG_PROFILE_DIR = os.getenv('BLOG_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+# Profiles kept there; older ones are deleted as new ones are written
+BLOG_PROFILE_KEEP = int(os.getenv('BLOG_PROFILE_KEEP', '200'))
+
+# Per-worker metrics snapshots summed by /api/metrics/; set BLOG_METRICS_TOKEN to let
+# a scraper in with `Authorization: Bearer <token>` (staff users always can)
+BLOG_METRICS_DIR = os.getenv('BLOG_METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+BLOG_METRICS_FLUSH_INTERVAL = int(os.getenv('BLOG_METRICS_FLUSH_INTERVAL', '5'))
+BLOG_METRICS_TOKEN = os.getenv('BLOG_METRICS_TOKEN', '')
+
+# Pre-rendered front page JSON (blog/snapshots.py), served by SnapshotWhiteNoiseMiddleware
+BLOG_SNAPSHOT_DIR = os.getenv('BLOG_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'snapshots'))
+BLOG_SNAPSHOT_URL = os.getenv('BLOG_SNAPSHOT_URL', '/snapshots/')
+# Newest published posts in the front page snapshot
+BLOG_SNAPSHOT_POSTS = int(os.getenv('BLOG_SNAPSHOT_POSTS', '50'))
+
+# Recommendations kept per post by `manage.py build_related_posts`
+BLOG_RELATED_POSTS = int(os.getenv('BLOG_RELATED_POSTS', '5'))
+
+# Public origin and post URL used in sitemaps and RSS/Atom feeds
+BLOG_SITE_URL = os.getenv('BLOG_SITE_URL', 'http://localhost:8000')
+BLOG_POST_URL_TEMPLATE = os.getenv('BLOG_POST_URL_TEMPLATE', '{site}/posts/{slug}/')
+# Seconds a built sitemap/feed is cached; bounds staleness in workers that missed the invalidation
+BLOG_SYNDICATION_TTL = int(os.getenv('BLOG_SYNDICATION_TTL', '300'))
+
+# Throttle windows, concurrency slots and pending view counts live in CACHES['default'].
+# Set BLOG_CACHE_URL (redis://host:6379/0 or memcached://host:11211) so every worker shares
+# them; without it each process has its own LocMemCache and every limit applies per worker.
+BLOG_CACHE_URL = os.getenv('BLOG_CACHE_URL', '')
+if BLOG_CACHE_URL.startswith(('redis://', 'rediss://')):
+    BACKEND_CACHE = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': BLOG_CACHE_URL}
+elif BLOG_CACHE_URL.startswith('memcached://'):
+    BACKEND_CACHE = {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+                     'LOCATION': BLOG_CACHE_URL[len('memcached://'):]}
+else:
+    BACKEND_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'unique-snowflake'}
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
\ No newline at end of file
+    # Counts hits/misses of the 'backend' alias for /api/metrics/ and passes everything through
+    'default': {'BACKEND': 'blog.metrics.InstrumentedCache', 'LOCATION': 'backend'},
+    'backend': BACKEND_CACHE,
+}
+
+if 'test' in sys.argv:
+    # Keep files written during tests out of the project tree
+    import tempfile
+    _test_files = tempfile.mkdtemp(prefix='blog-tests-')
+    BLOG_PROFILE_DIR = os.path.join(_test_files, 'profiles')
+    BLOG_METRICS_DIR = os.path.join(_test_files, 'metrics')
+    BLOG_SNAPSHOT_DIR = os.path.join(_test_files, 'snapshots')
+    # The test database is gone by the time the process exits
+    BLOG_VIEW_FLUSH_AT_EXIT = False